@@ -4,12 +4,18 @@ Uses Fernet symmetric encryption to ensure even server administrators cannot rea
 """
 from cryptography.fernet import Fernet
 from passlib.context import CryptContext
-from jose import JWTError, jwt
+import jwt
+from jwt import PyJWTError
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from app.core.cache import TTLCache
+import hashlib
+import hmac
 import os
+import time
 from pathlib import Path
+from typing import Optional, Tuple
 
 # Password hashing for regular users
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -19,51 +25,90 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 ADMIN_KEY_FILE = Path(__file__).parent.parent.parent / ".admin_key"
 ADMIN_PASSWORD_FILE = Path(__file__).parent.parent.parent / ".admin_password"
 
+# In-memory copies so admin logins don't hit the disk and Fernet every time.
+# The password is kept with the (st_mtime_ns, st_size) of the file it was read
+# from, so a reset by setup_admin.py (another process) is picked up on next login.
+_encryption_key_cache: Optional[bytes] = None
+_admin_password_cache: Optional[Tuple[Tuple[int, int], str]] = None
+_fernet: Optional[Fernet] = None
+
 def generate_encryption_key():
     """Generate a new encryption key for admin password"""
+    global _encryption_key_cache, _fernet
     key = Fernet.generate_key()
     with open(ADMIN_KEY_FILE, "wb") as f:
         f.write(key)
+    _encryption_key_cache = key
+    _fernet = None
     return key
 
 def get_encryption_key():
     """Get or create encryption key"""
+    global _encryption_key_cache
+    if _encryption_key_cache is not None:
+        return _encryption_key_cache
     if not ADMIN_KEY_FILE.exists():
         return generate_encryption_key()
     with open(ADMIN_KEY_FILE, "rb") as f:
-        return f.read()
+        _encryption_key_cache = f.read()
+    return _encryption_key_cache
+
+def _get_fernet() -> Fernet:
+    """Get the shared Fernet instance, creating it on first use"""
+    global _fernet
+    if _fernet is None:
+        _fernet = Fernet(get_encryption_key())
+    return _fernet
 
 def encrypt_admin_password(password: str) -> bytes:
     """Encrypt admin password using Fernet symmetric encryption"""
-    key = get_encryption_key()
-    fernet = Fernet(key)
-    return fernet.encrypt(password.encode())
+    return _get_fernet().encrypt(password.encode())
+
+def _password_file_signature() -> Tuple[int, int]:
+    """Modification time and size of the admin password file"""
+    stat_result = os.stat(ADMIN_PASSWORD_FILE)
+    return stat_result.st_mtime_ns, stat_result.st_size
 
 def decrypt_admin_password() -> str:
     """Decrypt admin password"""
-    if not ADMIN_PASSWORD_FILE.exists():
+    global _admin_password_cache, _encryption_key_cache, _fernet
+    try:
+        signature = _password_file_signature()
+    except FileNotFoundError:
         raise ValueError("Admin password not set")
-    
-    key = get_encryption_key()
-    fernet = Fernet(key)
-    
+
+    if _admin_password_cache is not None and _admin_password_cache[0] == signature:
+        return _admin_password_cache[1]
+
     with open(ADMIN_PASSWORD_FILE, "rb") as f:
         encrypted_password = f.read()
-    
-    return fernet.decrypt(encrypted_password).decode()
+
+    # The file was rewritten (or this is the first read); the key may have
+    # been regenerated along with it, so read that again too
+    _encryption_key_cache = None
+    _fernet = None
+    password = _get_fernet().decrypt(encrypted_password).decode()
+    _admin_password_cache = (signature, password)
+    return password
 
 def set_admin_password(password: str):
     """Set encrypted admin password"""
+    global _admin_password_cache
     encrypted = encrypt_admin_password(password)
     with open(ADMIN_PASSWORD_FILE, "wb") as f:
         f.write(encrypted)
+    _admin_password_cache = None
 
 def verify_admin_password(password: str) -> bool:
-    """Verify admin password"""
+    """Verify admin password using a constant-time comparison"""
+    candidate = password.encode('utf-8')
     try:
         stored_password = decrypt_admin_password()
-        return password == stored_password
+        return hmac.compare_digest(candidate, stored_password.encode('utf-8'))
     except Exception:
+        # Burn a comparison on the failure path too, so "not set" and
+        # "wrong password" are not distinguishable by response time
+        hmac.compare_digest(candidate, candidate)
         return False
 
 def is_admin_password_set() -> bool:
@@ -86,6 +131,25 @@ def create_admin_access_token(data: dict):
 # HTTP Bearer token authentication
 security = HTTPBearer()
 
+# Verified admin tokens: blake2b(token) -> (payload, exp timestamp).
+# Entries are also dropped after a minute so the cache stays small.
+_admin_token_cache = TTLCache(ttl=60, maxsize=10_000)
+
+def _decode_admin_token(token: str) -> dict:
+    """Decode an admin token, reusing the payload of a previously verified token until it expires"""
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    cached = _admin_token_cache.get(key)
+    if cached is not None:
+        payload, exp = cached
+        if time.time() < exp:
+            return payload
+        _admin_token_cache.pop(key)
+    
+    payload = jwt.decode(token, ADMIN_SECRET_KEY, algorithms=[ADMIN_ALGORITHM])
+    if payload.get("type") == "admin" and "exp" in payload:
+        _admin_token_cache.set(key, (payload, float(payload["exp"])))
+    return payload
+
 async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verify admin JWT token"""
     credentials_exception = HTTPException(
@@ -96,11 +160,11 @@ async def get_current_admin(credentials: HTTPAuthorizationCredentials = Depends(
     
     try:
         token = credentials.credentials
-        payload = jwt.decode(token, ADMIN_SECRET_KEY, algorithms=[ADMIN_ALGORITHM])
+        payload = _decode_admin_token(token)
         
         if payload.get("type") != "admin":
             raise credentials_exception
         
         return payload
-    except JWTError:
+    except PyJWTError:
         raise credentials_exception
@@ -0,0 +1,19 @@
+"""
+Response compression.
+JSON listings compress well; media downloads are already compressed (images, video)
+and are streamed from disk, so they are passed through untouched.
+"""
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.types import Receive, Scope, Send
+
+MEDIA_DOWNLOAD_PATH_MARKER = "/download-media/"
+
+
+class APIGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that skips media download routes"""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and MEDIA_DOWNLOAD_PATH_MARKER in scope["path"]:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -0,0 +1,42 @@
+"""
+Short-lived cache of the conversation lookup used by the send paths.
+A chat typically sends several messages in a row on the same conversation, so the
+(conversation, owner) row is kept for a few seconds instead of re-queried per send.
+"""
+from typing import Optional
+
+import asyncpg
+
+from app.core.cache import TTLCache
+from app.core.database import db
+
+CONVERSATION_CACHE_TTL = 5
+
+# What the send paths need from a conversation the user owns
+CONVERSATION_FOR_SEND_SQL = db.register_hot_query(
+    """
+    SELECT c.telegram_account_id, c.telegram_peer_id, c.title,
+           ta.target_language, ta.source_language
+    FROM conversations c
+    JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
+    WHERE c.id = $1 AND ta.user_id = $2
+    """
+)
+
+_conversation_cache = TTLCache(ttl=CONVERSATION_CACHE_TTL, maxsize=10_000)
+
+
+async def get_owned_conversation(conversation_id: int, user_id: int) -> Optional[asyncpg.Record]:
+    """The conversation's send details, or None if it isn't the user's (not cached)"""
+    key = (conversation_id, user_id)
+    conversation = _conversation_cache.get(key)
+    if conversation is None:
+        conversation = await db.fetchrow(CONVERSATION_FOR_SEND_SQL, conversation_id, user_id)
+        if conversation is not None:
+            _conversation_cache.set(key, conversation)
+    return conversation
+
+
+def invalidate_conversation_cache():
+    """Drop all cached lookups (account languages changed or an account was removed)"""
+    _conversation_cache.clear()
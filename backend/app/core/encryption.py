@@ -3,16 +3,72 @@ AES-256 Encryption Service for Secure Message Storage
 This module provides encryption/decryption functionality for messages using AES-256-GCM.
 Designed to be modular and can be easily enabled/disabled via admin settings.
 """
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+import asyncio
 import os
-import base64
-from typing import Optional, Tuple
+import hashlib
+import itertools
+import secrets
+import time
+from typing import Dict, List, Optional, Tuple
 import logging
 
+try:
+    # SIMD-accelerated drop-in replacement for the stdlib module
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 logger = logging.getLogger(__name__)
 
+DECRYPTION_ERROR_TEXT = "[Decryption Error]"
+
+# PBKDF2 parameters for the message key. Existing ciphertext was produced
+# under this derivation, so changing any of these makes stored messages unreadable.
+KDF_SALT = b'telegram_translator_salt'  # Static salt for deterministic key derivation
+KDF_ITERATIONS = 100000
+KDF_KEY_LENGTH = 32  # 256 bits
+
+# Plaintexts at least this large are encrypted straight into the output
+# buffer via the streaming GCM interface instead of AESGCM's one-shot call.
+LARGE_PAYLOAD_THRESHOLD = 16 * 1024
+
+# Derived keys are cached in memory so the 100k-iteration PBKDF2 run is paid
+# once per key per process. They are never written to disk: a stored copy would
+# decrypt every message without the passphrase.
+_derived_key_cache: Dict[bytes, bytes] = {}
+
+
+def derive_key(encryption_key: str) -> bytes:
+    """
+    Derive the 256-bit AES key from the configured key, reusing a cached result when possible.
+    
+    Args:
+        encryption_key: Base encryption key from environment variable
+        
+    Returns:
+        32-byte derived key
+    """
+    fingerprint = hashlib.sha256(encryption_key.encode()).digest()
+    key = _derived_key_cache.get(fingerprint)
+    if key is not None:
+        return key
+
+    # Derive a 256-bit key from the provided key using PBKDF2HMAC
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=KDF_KEY_LENGTH,
+        salt=KDF_SALT,
+        iterations=KDF_ITERATIONS,
+    )
+    key = kdf.derive(encryption_key.encode())
+
+    _derived_key_cache[fingerprint] = key
+    return key
+
 
 class EncryptionService:
     """
@@ -30,15 +86,30 @@ class EncryptionService:
         if not encryption_key:
             raise ValueError("Encryption key cannot be empty")
         
-        # Derive a 256-bit key from the provided key using PBKDF2HMAC
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,  # 256 bits
-            salt=b'telegram_translator_salt',  # Static salt for deterministic key derivation
-            iterations=100000,
-        )
-        self.key = kdf.derive(encryption_key.encode())
+        self.key = derive_key(encryption_key)
         self.aesgcm = AESGCM(self.key)
+        # Bound once so the per-message hot paths skip the attribute lookups
+        self._aes_encrypt = self.aesgcm.encrypt
+        self._aes_decrypt = self.aesgcm.decrypt
+        self._reseed_nonce()
+    
+    def _reseed_nonce(self):
+        """Pick a fresh random nonce prefix and restart the counter."""
+        self._nonce_prefix = secrets.token_bytes(8)
+        self._nonce_counter = itertools.count()
+    
+    def _next_nonce(self) -> bytes:
+        """
+        Build a 96-bit GCM nonce from a random 64-bit prefix and a 32-bit counter.
+        
+        The prefix is reseeded before the counter wraps, so nonces never repeat
+        under the same prefix.
+        """
+        counter = next(self._nonce_counter)
+        if counter > 0xFFFFFFFF:
+            self._reseed_nonce()
+            counter = next(self._nonce_counter)
+        return self._nonce_prefix + counter.to_bytes(4, 'big')
     
     def encrypt(self, plaintext: Optional[str]) -> Optional[str]:
         """
@@ -53,21 +124,44 @@ class EncryptionService:
         if plaintext is None or plaintext == "":
             return plaintext
         
+        return self._encrypt_with_nonce(self._next_nonce(), plaintext)
+    
+    def _encrypt_with_nonce(self, nonce: bytes, plaintext: str) -> str:
+        """Encrypt non-empty plaintext under the given unique 12-byte nonce."""
         try:
-            # Generate a random 96-bit nonce (12 bytes) for GCM
-            nonce = os.urandom(12)
+            data = plaintext.encode('utf-8')
+            if len(data) >= LARGE_PAYLOAD_THRESHOLD:
+                return base64.b64encode(self._encrypt_into(nonce, data)).decode('ascii')
             
             # Encrypt the data
-            ciphertext = self.aesgcm.encrypt(nonce, plaintext.encode('utf-8'), None)
+            ciphertext = self._aes_encrypt(nonce, data, None)
             
             # Prepend nonce to ciphertext and encode as base64
             encrypted_data = nonce + ciphertext
-            return base64.b64encode(encrypted_data).decode('utf-8')
+            return base64.b64encode(encrypted_data).decode('ascii')
         
         except Exception as e:
             logger.error(f"Encryption error: {e}")
             raise
     
+    def _encrypt_into(self, nonce: bytes, data: bytes) -> memoryview:
+        """
+        Encrypt into a single buffer laid out as nonce + ciphertext + tag.
+        
+        Produces the same bytes as nonce + AESGCM.encrypt(...), but writes the
+        ciphertext in place rather than allocating and then concatenating it.
+        """
+        # update_into needs block_size - 1 bytes of slack past the data
+        buf = bytearray(12 + len(data) + 15 + 16)
+        view = memoryview(buf)
+        view[:12] = nonce
+        
+        encryptor = Cipher(algorithms.AES(self.key), modes.GCM(nonce)).encryptor()
+        end = 12 + encryptor.update_into(data, view[12:])
+        encryptor.finalize()
+        view[end:end + 16] = encryptor.tag
+        return view[:end + 16]
+    
     def decrypt(self, encrypted_data: Optional[str]) -> Optional[str]:
         """
         Decrypt AES-256-GCM encrypted data.
@@ -83,14 +177,14 @@ class EncryptionService:
         
         try:
             # Decode from base64
-            data = base64.b64decode(encrypted_data.encode('utf-8'))
+            data = memoryview(base64.b64decode(encrypted_data.encode('ascii')))
             
-            # Extract nonce (first 12 bytes) and ciphertext
+            # Extract nonce (first 12 bytes) and ciphertext without copying
             nonce = data[:12]
             ciphertext = data[12:]
             
             # Decrypt the data
-            plaintext = self.aesgcm.decrypt(nonce, ciphertext, None)
+            plaintext = self._aes_decrypt(nonce, ciphertext, None)
             return plaintext.decode('utf-8')
         
         except Exception as e:
@@ -109,8 +203,10 @@ class EncryptionService:
         Returns:
             Tuple of (encrypted_original, encrypted_translated)
         """
-        encrypted_original = self.encrypt(original_text) if original_text else None
-        encrypted_translated = self.encrypt(translated_text) if translated_text else None
+        # Each field keeps its own ciphertext (and nonce) so stored rows stay
+        # independently decryptable
+        encrypted_original = self._encrypt_with_nonce(self._next_nonce(), original_text) if original_text else None
+        encrypted_translated = self._encrypt_with_nonce(self._next_nonce(), translated_text) if translated_text else None
         return encrypted_original, encrypted_translated
     
     def decrypt_message_fields(self, encrypted_original: Optional[str],
@@ -128,6 +224,35 @@ class EncryptionService:
         decrypted_original = self.decrypt(encrypted_original) if encrypted_original else None
         decrypted_translated = self.decrypt(encrypted_translated) if encrypted_translated else None
         return decrypted_original, decrypted_translated
+    
+    def decrypt_batch(self, items: List[Optional[str]]) -> List[Optional[str]]:
+        """
+        Decrypt many values in a single pass.
+        
+        Intended to be run off the event loop (e.g. via asyncio.to_thread) so a
+        whole page of messages is decrypted in one hop. Values that fail to
+        decrypt are replaced with DECRYPTION_ERROR_TEXT instead of raising.
+        
+        Args:
+            items: Base64-encoded encrypted values (None/empty are passed through)
+            
+        Returns:
+            Decrypted values in the same order as items
+        """
+        b64decode = base64.b64decode
+        decrypt = self._aes_decrypt
+        results: List[Optional[str]] = []
+        for item in items:
+            if not item:
+                results.append(item)
+                continue
+            try:
+                data = memoryview(b64decode(item))
+                results.append(decrypt(data[:12], data[12:], None).decode('utf-8'))
+            except Exception as e:
+                logger.error(f"Decryption error: {e}")
+                results.append(DECRYPTION_ERROR_TEXT)
+        return results
 
 
 # Global encryption service instance
@@ -160,21 +285,42 @@ def get_encryption_service() -> Optional[EncryptionService]:
     return _encryption_service
 
 
+# The encryption toggle is read on every message write but only changes when
+# an admin flips it, so the value is cached briefly: (monotonic time, enabled)
+ENCRYPTION_SETTING_TTL = 5.0
+_encryption_enabled_cache: Optional[Tuple[float, bool]] = None
+
+
+def invalidate_encryption_enabled_cache():
+    """Drop the cached encryption toggle so the next check reads the database."""
+    global _encryption_enabled_cache
+    _encryption_enabled_cache = None
+
+
 async def is_encryption_enabled(db) -> bool:
     """
     Check if encryption is currently enabled in the system settings.
     
+    The result is cached for ENCRYPTION_SETTING_TTL seconds.
+    
     Args:
         db: Database connection
         
     Returns:
         True if encryption is enabled, False otherwise
     """
+    global _encryption_enabled_cache
+    cached = _encryption_enabled_cache
+    if cached is not None and time.monotonic() - cached[0] < ENCRYPTION_SETTING_TTL:
+        return cached[1]
+    
     try:
         result = await db.fetchval(
             "SELECT encryption_enabled FROM system_settings WHERE id = 1"
         )
-        return result if result is not None else False
+        enabled = result if result is not None else False
+        _encryption_enabled_cache = (time.monotonic(), enabled)
+        return enabled
     except Exception as e:
         logger.error(f"Error checking encryption status: {e}")
         return False
@@ -222,6 +368,38 @@ async def decrypt_message_if_encrypted(is_encrypted: bool, original_text: Option
             return _encryption_service.decrypt_message_fields(original_text, translated_text)
         except Exception as e:
             logger.error(f"Failed to decrypt message: {e}")
-            return "[Decryption Error]", "[Decryption Error]"
+            return DECRYPTION_ERROR_TEXT, DECRYPTION_ERROR_TEXT
     
     return original_text, translated_text
+
+
+async def decrypt_messages_if_encrypted(messages: list) -> None:
+    """
+    Decrypt encrypted message rows in place.
+    
+    All encrypted fields are decrypted together in a worker thread rather than
+    one await per message. Encrypted rows are replaced with dicts holding the
+    plaintext; other rows (asyncpg Records or dicts) are left untouched.
+    
+    Args:
+        messages: Message rows with is_encrypted, original_text and translated_text keys
+    """
+    if not _encryption_service:
+        return
+    
+    indexes = [i for i, msg in enumerate(messages) if msg.get('is_encrypted')]
+    if not indexes:
+        return
+    
+    items = []
+    for i in indexes:
+        items.append(messages[i].get('original_text'))
+        items.append(messages[i].get('translated_text'))
+    
+    decrypted = await asyncio.to_thread(_encryption_service.decrypt_batch, items)
+    
+    for n, i in enumerate(indexes):
+        msg = dict(messages[i])
+        msg['original_text'] = decrypted[2 * n]
+        msg['translated_text'] = decrypted[2 * n + 1]
+        messages[i] = msg
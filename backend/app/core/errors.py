@@ -0,0 +1,45 @@
+"""
+Unexpected-error handling.
+Turns an exception no route handled into a JSON 500. It runs inside CORSMiddleware
+(an app-level Exception handler would run outside it), so the frontend still gets
+CORS headers and can read the body.
+"""
+import logging
+
+from fastapi.responses import ORJSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+
+class UnhandledErrorMiddleware:
+    """Log an unhandled error once and answer with {"detail": "Internal server error"}"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            if response_started:
+                # Too late to send a 500; let the server close the connection
+                raise
+            logger.error(
+                f"Unhandled error on {scope['method']} {scope['path']}: {exc}",
+                exc_info=exc,
+            )
+            response = ORJSONResponse(status_code=500, content={"detail": "Internal server error"})
+            await response(scope, receive, send)
@@ -0,0 +1,88 @@
+"""
+On-disk cache of media downloaded from Telegram.
+Files live at temp/downloads/{conversation_id}/{telegram_message_id}{ext}, where
+Telethon picks the extension. A small "{telegram_message_id}.meta" sidecar records
+the actual filename so a cache hit is a direct lookup rather than a directory scan.
+"""
+import os
+from typing import Optional, Tuple
+
+# Extensions Telethon commonly assigns; probed for files cached before sidecars existed
+KNOWN_MEDIA_EXTENSIONS = (
+    '.jpg', '.jpeg', '.png', '.gif', '.webp',
+    '.mp4', '.webm', '.mov', '.avi',
+    '.ogg', '.oga', '.mp3', '.m4a',
+    '.pdf', '.tgs', '',
+)
+
+META_SUFFIX = ".meta"
+
+# Content types for cached media, so browsers can render/play them inline
+MEDIA_TYPES_BY_EXTENSION = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.mp4': 'video/mp4',
+    '.webm': 'video/webm',
+    '.mov': 'video/quicktime',
+    '.avi': 'video/x-msvideo',
+    '.ogg': 'audio/ogg',
+    '.oga': 'audio/ogg',
+    '.mp3': 'audio/mpeg',
+    '.m4a': 'audio/mp4',
+    '.pdf': 'application/pdf',
+}
+
+
+def find_cached_media(download_dir: str, base_filename: str) -> Optional[Tuple[str, os.stat_result]]:
+    """
+    Look up a cached media file without listing the directory.
+    
+    Returns:
+        (file_path, stat_result) of the cached file, or None on a cache miss
+    """
+    try:
+        with open(os.path.join(download_dir, base_filename + META_SUFFIX)) as f:
+            candidates = (f.read().strip(),)
+    except OSError:
+        candidates = tuple(base_filename + ext for ext in KNOWN_MEDIA_EXTENSIONS)
+    
+    for name in candidates:
+        path = os.path.join(download_dir, name)
+        try:
+            return path, os.stat(path)
+        except OSError:
+            continue
+    return None
+
+
+def remember_cached_media(download_dir: str, base_filename: str, file_path: str):
+    """Record the filename Telethon chose for a freshly downloaded media file"""
+    with open(os.path.join(download_dir, base_filename + META_SUFFIX), "w") as f:
+        f.write(os.path.basename(file_path))
+
+
+def lookup_cached_media(download_dir: str, base_filename: str) -> Optional[Tuple[str, os.stat_result]]:
+    """
+    Ensure the download directory exists and look up a cached file in it.
+    Blocking; meant to be run via asyncio.to_thread.
+    """
+    os.makedirs(download_dir, exist_ok=True)
+    return find_cached_media(download_dir, base_filename)
+
+
+def store_downloaded_media(download_dir: str, base_filename: str, file_path: str) -> os.stat_result:
+    """
+    Record a freshly downloaded file and return its stat.
+    Blocking; meant to be run via asyncio.to_thread.
+    """
+    remember_cached_media(download_dir, base_filename, file_path)
+    return os.stat(file_path)
+
+
+def media_type_for(file_path: str) -> str:
+    """Content type of a cached media file, from its extension"""
+    ext = os.path.splitext(file_path)[1].lower()
+    return MEDIA_TYPES_BY_EXTENSION.get(ext, 'application/octet-stream')
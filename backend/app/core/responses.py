@@ -0,0 +1,23 @@
+"""
+JSON response helpers.
+Lets routes return asyncpg Records as-is instead of copying each row into a dict first.
+"""
+from typing import Any
+
+import asyncpg
+import orjson
+from fastapi.responses import ORJSONResponse
+
+
+def _default(obj: Any):
+    """Serialize types orjson does not handle natively"""
+    if isinstance(obj, asyncpg.Record):
+        return dict(obj.items())
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class RecordJSONResponse(ORJSONResponse):
+    """ORJSONResponse that also serializes asyncpg Records (and lists of them)"""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default)
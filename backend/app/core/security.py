@@ -1,5 +1,7 @@
 # Re-export auth helpers for unified imports
 from auth import (  # noqa: F401
+    DUMMY_HASH,
+    USERNAME_EXISTS_SQL,
     verify_password,
     get_password_hash,
     create_access_token,
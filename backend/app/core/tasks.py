@@ -0,0 +1,29 @@
+"""
+Fire-and-forget background tasks.
+Keeps a reference to each task until it finishes (the event loop only holds weak
+references) and logs failures instead of leaving them unretrieved.
+"""
+import asyncio
+import logging
+from typing import Coroutine, Set
+
+logger = logging.getLogger(__name__)
+
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _on_done(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None:
+        logger.error(f"Background task {task.get_name()} failed: {exc}", exc_info=exc)
+
+
+def spawn(coro: Coroutine, name: str = None) -> asyncio.Task:
+    """Run a coroutine in the background without awaiting it"""
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_on_done)
+    return task
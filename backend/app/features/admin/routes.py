@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
 from pydantic import BaseModel
 from typing import Optional, List
 from datetime import datetime
@@ -8,16 +9,39 @@ from app.core.admin_security import (
     get_current_admin,
     is_admin_password_set,
 )
-from app.core.encryption import get_encryption_service, decrypt_message_if_encrypted
+from app.core.cache import TTLCache
+from app.core.conversation_cache import invalidate_conversation_cache
+from app.core.encryption import (
+    get_encryption_service,
+    decrypt_messages_if_encrypted,
+    invalidate_encryption_enabled_cache,
+)
+from app.core.media_cache import lookup_cached_media, store_downloaded_media, media_type_for
+from app.core.responses import RecordJSONResponse
 from database import db
-from auth import get_password_hash
+from models import MessageResponse
+from auth import get_password_hash, USERNAME_EXISTS_SQL
+from telethon_service import telethon_service
+import asyncio
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
+# Dashboard aggregates are admin-global (not per-user), so one short-lived copy
+# per worker is shared by every admin request
+STATISTICS_CACHE_TTL = 30
+ENCRYPTION_SETTINGS_CACHE_TTL = 60
+_admin_cache = TTLCache(ttl=STATISTICS_CACHE_TTL, maxsize=16)
+
+# Above this many rows the statistics endpoint reports an estimated message total
+MESSAGE_COUNT_ESTIMATE_THRESHOLD = 1_000_000
+
 # Request/Response Models
+# Listing routes return rows straight from the database as RecordJSONResponse, which
+# FastAPI passes through without validation; their response models document the shape.
 class AdminLoginRequest(BaseModel):
     password: str
 
@@ -38,6 +62,40 @@ class ColleagueUpdate(BaseModel):
 class PasswordReset(BaseModel):
     password: str
 
+class ColleagueAccount(BaseModel):
+    id: int
+    user_id: int
+    display_name: str
+    account_name: str
+    is_active: bool
+    source_language: str
+    target_language: str
+    created_at: datetime
+    last_used: Optional[datetime]
+
+class ColleagueDetailResponse(BaseModel):
+    id: int
+    username: str
+    email: Optional[str]
+    is_active: bool
+    created_at: datetime
+    last_login: Optional[datetime]
+    accounts: List[ColleagueAccount]
+
+class ColleagueResponse(ColleagueDetailResponse):
+    total_messages: int
+    total_conversations: int
+
+class AdminMessageResponse(MessageResponse):
+    has_media: bool = False
+
+class StatisticsResponse(BaseModel):
+    total_users: int
+    active_users: int
+    total_accounts: int
+    total_conversations: int
+    total_messages: int
+
 class EncryptionSettingsUpdate(BaseModel):
     encryption_enabled: bool
 
@@ -75,82 +133,73 @@ async def verify_admin_token(admin = Depends(get_current_admin)):
     return {"status": "valid"}
 
 # Colleague Management Routes
-@router.get("/colleagues")
+@router.get("/colleagues", response_model=List[ColleagueResponse])
 async def get_colleagues(admin = Depends(get_current_admin)):
     """Get all colleagues with their accounts and statistics"""
     colleagues = await db.fetch("""
         SELECT 
             u.id, u.username, u.email, u.is_active, u.created_at, u.last_login,
-            COUNT(DISTINCT ta.id) as account_count,
-            COUNT(DISTINCT c.id) as conversation_count,
-            COUNT(DISTINCT m.id) as message_count
+            (
+                SELECT COUNT(*)
+                FROM conversations c
+                JOIN telegram_accounts ta ON ta.id = c.telegram_account_id
+                WHERE ta.user_id = u.id
+            ) as total_conversations,
+            (
+                SELECT COUNT(*)
+                FROM messages m
+                JOIN conversations c ON c.id = m.conversation_id
+                JOIN telegram_accounts ta ON ta.id = c.telegram_account_id
+                WHERE ta.user_id = u.id
+            ) as total_messages,
+            COALESCE((
+                SELECT json_agg(acc ORDER BY acc.created_at DESC)
+                FROM (
+                    SELECT id, user_id, display_name, account_name, is_active, 
+                           source_language, target_language, created_at, last_used
+                    FROM telegram_accounts
+                    WHERE user_id = u.id
+                ) acc
+            ), '[]'::json) as accounts
         FROM users u
-        LEFT JOIN telegram_accounts ta ON ta.user_id = u.id
-        LEFT JOIN conversations c ON c.telegram_account_id = ta.id
-        LEFT JOIN messages m ON m.conversation_id = c.id
-        GROUP BY u.id, u.username, u.email, u.is_active, u.created_at, u.last_login
         ORDER BY u.created_at DESC
     """)
     
-    result = []
-    for colleague in colleagues:
-        # Get accounts for this colleague
-        accounts = await db.fetch("""
-            SELECT id, user_id, display_name, account_name, is_active, 
-                   source_language, target_language, created_at, last_used
-            FROM telegram_accounts
-            WHERE user_id = $1
-            ORDER BY created_at DESC
-        """, colleague['id'])
-        
-        result.append({
-            "id": colleague['id'],
-            "username": colleague['username'],
-            "email": colleague['email'],
-            "is_active": colleague['is_active'],
-            "created_at": colleague['created_at'].isoformat(),
-            "last_login": colleague['last_login'].isoformat() if colleague['last_login'] else None,
-            "accounts": [dict(acc) for acc in accounts],
-            "total_messages": colleague['message_count'],
-            "total_conversations": colleague['conversation_count'],
-        })
-    
-    return result
+    return RecordJSONResponse(colleagues)
 
-@router.get("/colleagues/{colleague_id}")
+@router.get("/colleagues/{colleague_id}", response_model=ColleagueDetailResponse)
 async def get_colleague(colleague_id: int, admin = Depends(get_current_admin)):
     """Get specific colleague details"""
     colleague = await db.fetchrow("""
-        SELECT id, username, email, is_active, created_at, last_login
-        FROM users
-        WHERE id = $1
+        SELECT 
+            u.id, u.username, u.email, u.is_active, u.created_at, u.last_login,
+            COALESCE((
+                SELECT json_agg(acc ORDER BY acc.created_at DESC)
+                FROM (
+                    SELECT id, user_id, display_name, account_name, is_active, 
+                           source_language, target_language, created_at, last_used
+                    FROM telegram_accounts
+                    WHERE user_id = u.id
+                ) acc
+            ), '[]'::json) as accounts
+        FROM users u
+        WHERE u.id = $1
     """, colleague_id)
     
     if not colleague:
         raise HTTPException(status_code=404, detail="Colleague not found")
     
-    accounts = await db.fetch("""
-        SELECT id, user_id, display_name, account_name, is_active, 
-               source_language, target_language, created_at, last_used
-        FROM telegram_accounts
-        WHERE user_id = $1
-        ORDER BY created_at DESC
-    """, colleague_id)
-    
-    return {
-        **dict(colleague),
-        "accounts": [dict(acc) for acc in accounts]
-    }
+    return RecordJSONResponse(colleague)
 
 @router.post("/colleagues", status_code=status.HTTP_201_CREATED)
 async def create_colleague(data: ColleagueCreate, admin = Depends(get_current_admin)):
     """Create new colleague account"""
     # Check if username exists
-    existing = await db.fetchrow("SELECT id FROM users WHERE username = $1", data.username)
+    existing = await db.fetchrow(USERNAME_EXISTS_SQL, data.username)
     if existing:
         raise HTTPException(status_code=400, detail="Username already exists")
     
-    password_hash = get_password_hash(data.password)
+    password_hash = await asyncio.to_thread(get_password_hash, data.password)
     
     colleague_id = await db.fetchval("""
         INSERT INTO users (username, password_hash, email, is_active)
@@ -158,6 +207,7 @@ async def create_colleague(data: ColleagueCreate, admin = Depends(get_current_ad
         RETURNING id
     """, data.username, password_hash, data.email)
     
+    _admin_cache.pop("statistics")
     return {"id": colleague_id, "message": "Colleague created successfully"}
 
 @router.put("/colleagues/{colleague_id}")
@@ -167,47 +217,37 @@ async def update_colleague(
     admin = Depends(get_current_admin)
 ):
     """Update colleague information"""
-    colleague = await db.fetchrow("SELECT id FROM users WHERE id = $1", colleague_id)
-    if not colleague:
-        raise HTTPException(status_code=404, detail="Colleague not found")
-    
-    # Build update query dynamically
-    updates = []
-    values = []
-    param_count = 1
-    
-    if data.username is not None:
-        updates.append(f"username = ${param_count}")
-        values.append(data.username)
-        param_count += 1
-    
-    if data.email is not None:
-        updates.append(f"email = ${param_count}")
-        values.append(data.email)
-        param_count += 1
-    
-    if data.is_active is not None:
-        updates.append(f"is_active = ${param_count}")
-        values.append(data.is_active)
-        param_count += 1
-    
-    if not updates:
+    if data.username is None and data.email is None and data.is_active is None:
+        colleague = await db.fetchval("SELECT id FROM users WHERE id = $1", colleague_id)
+        if colleague is None:
+            raise HTTPException(status_code=404, detail="Colleague not found")
         return {"message": "No updates provided"}
     
-    values.append(colleague_id)
-    query = f"UPDATE users SET {', '.join(updates)} WHERE id = ${param_count}"
+    # Fixed-shape statement: omitted (None) fields keep their current value
+    updated = await db.fetchval("""
+        UPDATE users
+        SET username = COALESCE($1, username),
+            email = COALESCE($2, email),
+            is_active = COALESCE($3, is_active)
+        WHERE id = $4
+        RETURNING id
+    """, data.username, data.email, data.is_active, colleague_id)
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Colleague not found")
     
-    await db.execute(query, *values)
+    _admin_cache.pop("statistics")
     return {"message": "Colleague updated successfully"}
 
 @router.delete("/colleagues/{colleague_id}")
 async def delete_colleague(colleague_id: int, admin = Depends(get_current_admin)):
     """Delete colleague and all associated data"""
-    colleague = await db.fetchrow("SELECT id FROM users WHERE id = $1", colleague_id)
-    if not colleague:
+    deleted = await db.fetchval("DELETE FROM users WHERE id = $1 RETURNING id", colleague_id)
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Colleague not found")
     
-    await db.execute("DELETE FROM users WHERE id = $1", colleague_id)
+    # Their telegram accounts went with them (ON DELETE CASCADE)
+    invalidate_conversation_cache()
+    _admin_cache.pop("statistics")
     return {"message": "Colleague deleted successfully"}
 
 @router.post("/colleagues/{colleague_id}/reset-password")
@@ -217,16 +257,14 @@ async def reset_colleague_password(
     admin = Depends(get_current_admin)
 ):
     """Reset colleague password"""
-    colleague = await db.fetchrow("SELECT id FROM users WHERE id = $1", colleague_id)
-    if not colleague:
-        raise HTTPException(status_code=404, detail="Colleague not found")
-    
-    password_hash = get_password_hash(data.password)
-    await db.execute(
-        "UPDATE users SET password_hash = $1 WHERE id = $2",
+    password_hash = await asyncio.to_thread(get_password_hash, data.password)
+    updated = await db.fetchval(
+        "UPDATE users SET password_hash = $1 WHERE id = $2 RETURNING id",
         password_hash,
         colleague_id
     )
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Colleague not found")
     
     return {"message": "Password reset successfully"}
 
@@ -238,8 +276,6 @@ async def get_conversations(
     admin = Depends(get_current_admin)
 ):
     """Get conversations with filters"""
-    from telethon_service import telethon_service
-    
     query = """
         SELECT c.*, ta.id as account_id, ta.display_name as account_name, u.username as colleague_username
         FROM conversations c
@@ -261,102 +297,113 @@ async def get_conversations(
     
     conversations = await db.fetch(query, *params)
     
+    # Account owner IDs are cached on each session at connect time
+    telegram_user_ids = {}
+    for aid in {conv['account_id'] for conv in conversations}:
+        session = telethon_service.sessions.get(aid)
+        if session and session.client and session.is_connected:
+            telegram_user_ids[aid] = session.me_id
+    
     # Add account owner's Telegram user ID to each conversation
     result = []
     for conv in conversations:
         conv_dict = dict(conv)
-        # Try to get the account owner's Telegram user ID from the session
-        session = telethon_service.sessions.get(conv['account_id'])
-        if session and session.client and session.is_connected:
-            try:
-                me = await session.client.get_me()
-                conv_dict['account_telegram_user_id'] = me.id
-            except Exception:
-                conv_dict['account_telegram_user_id'] = None
-        else:
-            conv_dict['account_telegram_user_id'] = None
+        conv_dict['account_telegram_user_id'] = telegram_user_ids.get(conv['account_id'])
         result.append(conv_dict)
     
     return result
 
-@router.get("/messages")
+@router.get("/messages", response_model=List[AdminMessageResponse])
 async def get_messages(
     user_id: Optional[int] = None,
     account_id: Optional[int] = None,
     conversation_id: Optional[int] = None,
     limit: int = 100,
     offset: int = 0,
+    before_created_at: Optional[datetime] = None,
+    before_id: Optional[int] = None,
     admin = Depends(get_current_admin)
 ):
-    """Get messages with filters"""
+    """Get messages with filters
+    
+    Pass the created_at and id of the oldest message already loaded as
+    before_created_at/before_id to page backwards without an OFFSET scan.
+    """
     query = """
         SELECT m.*
         FROM messages m
-        JOIN conversations c ON c.id = m.conversation_id
-        JOIN telegram_accounts ta ON ta.id = c.telegram_account_id
-        JOIN users u ON u.id = ta.user_id
         WHERE 1=1
     """
     params = []
     
     if user_id:
         params.append(user_id)
-        query += f" AND u.id = ${len(params)}"
+        query += f"""
+            AND m.conversation_id IN (
+                SELECT c.id FROM conversations c
+                JOIN telegram_accounts ta ON ta.id = c.telegram_account_id
+                WHERE ta.user_id = ${len(params)}
+            )"""
     
     if account_id:
         params.append(account_id)
-        query += f" AND ta.id = ${len(params)}"
+        query += f"""
+            AND m.conversation_id IN (
+                SELECT c.id FROM conversations c WHERE c.telegram_account_id = ${len(params)}
+            )"""
     
     if conversation_id:
         params.append(conversation_id)
-        query += f" AND c.id = ${len(params)}"
+        query += f" AND m.conversation_id = ${len(params)}"
+    
+    if before_created_at is not None and before_id is not None:
+        params.append(before_created_at)
+        params.append(before_id)
+        query += f" AND (m.created_at, m.id) < (${len(params) - 1}, ${len(params)})"
     
-    query += " ORDER BY m.created_at DESC"
+    query += " ORDER BY m.created_at DESC, m.id DESC"
     
     params.append(limit)
     query += f" LIMIT ${len(params)}"
     
-    params.append(offset)
-    query += f" OFFSET ${len(params)}"
+    if offset:
+        params.append(offset)
+        query += f" OFFSET ${len(params)}"
     
     messages = await db.fetch(query, *params)
     
-    # Decrypt messages if they are encrypted
-    result = []
-    for msg in reversed(messages):
-        msg_dict = dict(msg)
-        
-        # Decrypt message if encrypted
-        is_encrypted = msg_dict.get('is_encrypted', False)
-        if is_encrypted:
-            original_text, translated_text = await decrypt_message_if_encrypted(
-                is_encrypted, msg_dict.get('original_text'), msg_dict.get('translated_text')
-            )
-            msg_dict['original_text'] = original_text
-            msg_dict['translated_text'] = translated_text
-        
-        result.append(msg_dict)
+    result = messages[::-1]
     
-    return result
+    # Decrypt all encrypted messages in one batch off the event loop
+    await decrypt_messages_if_encrypted(result)
+    
+    return RecordJSONResponse(result)
 
 # Statistics Route
-@router.get("/statistics")
+@router.get("/statistics", response_model=StatisticsResponse)
 async def get_statistics(admin = Depends(get_current_admin)):
     """Get overall statistics"""
+    stats = _admin_cache.get("statistics")
+    if stats is not None:
+        return RecordJSONResponse(stats)
+    
+    # Exact counts are cheap for the small tables; messages switches to the
+    # planner's row estimate once it is large enough that a full count hurts
     stats = await db.fetchrow("""
         SELECT 
-            COUNT(DISTINCT u.id) as total_users,
-            COUNT(DISTINCT CASE WHEN u.is_active THEN u.id END) as active_users,
-            COUNT(DISTINCT ta.id) as total_accounts,
-            COUNT(DISTINCT c.id) as total_conversations,
-            COUNT(DISTINCT m.id) as total_messages
-        FROM users u
-        LEFT JOIN telegram_accounts ta ON ta.user_id = u.id
-        LEFT JOIN conversations c ON c.telegram_account_id = ta.id
-        LEFT JOIN messages m ON m.conversation_id = c.id
-    """)
-    
-    return dict(stats)
+            (SELECT COUNT(*) FROM users) as total_users,
+            (SELECT COUNT(*) FROM users WHERE is_active) as active_users,
+            (SELECT COUNT(*) FROM telegram_accounts) as total_accounts,
+            (SELECT COUNT(*) FROM conversations) as total_conversations,
+            CASE
+                WHEN est.reltuples >= $1 THEN est.reltuples::bigint
+                ELSE (SELECT COUNT(*) FROM messages)
+            END as total_messages
+        FROM (SELECT reltuples FROM pg_class WHERE oid = 'messages'::regclass) est
+    """, MESSAGE_COUNT_ESTIMATE_THRESHOLD)
+    _admin_cache.set("statistics", stats)
+    
+    return RecordJSONResponse(stats)
 
 # Media Download Route for Admin
 @router.get("/download-media/{conversation_id}/{message_id}")
@@ -367,14 +414,6 @@ async def admin_download_media(
     admin = Depends(get_current_admin)
 ):
     """Download media from a message (admin access)"""
-    from fastapi.responses import FileResponse
-    from fastapi import HTTPException, status
-    import os
-    import logging
-    from telethon_service import telethon_service
-    
-    logger = logging.getLogger(__name__)
-    
     # Get message with account info (admin can access any message)
     message = await db.fetchrow(
         """
@@ -394,22 +433,20 @@ async def admin_download_media(
         )
 
     try:
-        # Create structured downloads directory
+        # Structured downloads directory
         download_dir = f"temp/downloads/{conversation_id}"
-        os.makedirs(download_dir, exist_ok=True)
         
         # Use telegram_message_id as base filename
         base_filename = str(telegram_message_id)
         download_path = os.path.join(download_dir, base_filename)
         
-        # Check if file already exists (cached)
-        existing_files = [f for f in os.listdir(download_dir) if f.startswith(base_filename)]
+        # Create the directory and check for a cached file off the event loop
+        cached = await asyncio.to_thread(lookup_cached_media, download_dir, base_filename)
         
-        if existing_files:
+        if cached:
             # Use cached file
-            cached_file = os.path.join(download_dir, existing_files[0])
-            logger.info(f"Using cached media file: {cached_file}")
-            file_path = cached_file
+            file_path, stat_result = cached
+            logger.info(f"Using cached media file: {file_path}")
         else:
             # Download media via Telethon
             logger.info(f"Downloading media for message {telegram_message_id}")
@@ -435,6 +472,9 @@ async def admin_download_media(
                     )
                     
                 logger.info(f"Downloaded media to: {file_path}")
+                stat_result = await asyncio.to_thread(
+                    store_downloaded_media, download_dir, base_filename, file_path
+                )
             except Exception as e:
                 logger.error(f"Failed to download media: {e}")
                 if "deleted" in str(e).lower() or "expired" in str(e).lower():
@@ -447,28 +487,16 @@ async def admin_download_media(
                     detail=f"Failed to download media: {str(e)}"
                 )
         
-        # Determine media type from file extension
         file_ext = os.path.splitext(file_path)[1].lower()
-        media_type_map = {
-            '.jpg': 'image/jpeg',
-            '.jpeg': 'image/jpeg',
-            '.png': 'image/png',
-            '.gif': 'image/gif',
-            '.webp': 'image/webp',
-            '.mp4': 'video/mp4',
-            '.webm': 'video/webm',
-            '.mov': 'video/quicktime',
-            '.avi': 'video/x-msvideo',
-        }
-        media_type = media_type_map.get(file_ext, 'application/octet-stream')
         
         # Use stored filename or generate from telegram_message_id
         filename = message['media_file_name'] or f"media_{telegram_message_id}{file_ext}"
         
         return FileResponse(
             path=file_path,
-            media_type=media_type,
-            filename=filename
+            media_type=media_type_for(file_path),
+            filename=filename,
+            stat_result=stat_result
         )
         
     except HTTPException:
@@ -484,12 +512,32 @@ async def admin_download_media(
 @router.get("/encryption/settings", response_model=EncryptionSettingsResponse)
 async def get_encryption_settings(admin = Depends(get_current_admin)):
     """Get current encryption settings and statistics"""
-    # Get encryption settings
-    settings = await db.fetchrow("""
-        SELECT encryption_enabled, encryption_enabled_at, encryption_disabled_at, updated_at
-        FROM system_settings
-        WHERE id = 1
-    """)
+    cached = _admin_cache.get("encryption_settings")
+    if cached is not None:
+        return cached
+    
+    # Settings row and message statistics are independent; fetch them concurrently
+    settings, message_stats = await asyncio.gather(
+        db.fetchrow("""
+            SELECT encryption_enabled, encryption_enabled_at, encryption_disabled_at, updated_at
+            FROM system_settings
+            WHERE id = 1
+        """),
+        db.fetchrow("""
+            SELECT total as total_messages, encrypted as encrypted_messages
+            FROM message_counters
+            WHERE id = 1
+        """),
+    )
+    
+    if not message_stats:
+        # Counters row missing (e.g. removed by hand); fall back to a full count
+        message_stats = await db.fetchrow("""
+            SELECT 
+                COUNT(*) as total_messages,
+                COUNT(*) FILTER (WHERE is_encrypted = TRUE) as encrypted_messages
+            FROM messages
+        """)
     
     if not settings:
         # Initialize settings if not exists
@@ -504,18 +552,10 @@ async def get_encryption_settings(admin = Depends(get_current_admin)):
             WHERE id = 1
         """)
     
-    # Get message statistics
-    message_stats = await db.fetchrow("""
-        SELECT 
-            COUNT(*) as total_messages,
-            COUNT(*) FILTER (WHERE is_encrypted = TRUE) as encrypted_messages
-        FROM messages
-    """)
-    
     # Check if encryption service is available
     encryption_service = get_encryption_service()
     
-    return {
+    result = {
         "encryption_enabled": settings['encryption_enabled'],
         "encryption_enabled_at": settings['encryption_enabled_at'],
         "encryption_disabled_at": settings['encryption_disabled_at'],
@@ -524,6 +564,9 @@ async def get_encryption_settings(admin = Depends(get_current_admin)):
         "total_messages": message_stats['total_messages'] or 0,
         "encrypted_messages": message_stats['encrypted_messages'] or 0,
     }
+    _admin_cache.set("encryption_settings", result, ttl=ENCRYPTION_SETTINGS_CACHE_TTL)
+    
+    return result
 
 @router.put("/encryption/settings")
 async def update_encryption_settings(
@@ -575,6 +618,9 @@ async def update_encryption_settings(
             """)
             logger.info("Encryption disabled by admin")
     
+    invalidate_encryption_enabled_cache()
+    _admin_cache.pop("encryption_settings")
+    
     return {
         "message": f"Encryption {'enabled' if data.encryption_enabled else 'disabled'} successfully",
         "encryption_enabled": data.encryption_enabled
@@ -3,18 +3,26 @@ from datetime import timedelta
 from app.core.config import settings
 from app.core.database import db
 from app.core.security import (
+    DUMMY_HASH,
+    USERNAME_EXISTS_SQL,
     get_password_hash,
     verify_password,
     create_access_token,
     get_current_user,
 )
+from app.core.tasks import spawn
 from models import UserCreate, UserLogin, Token, UserResponse
+import asyncio
 import logging
 
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
+LOGIN_USER_SQL = db.register_hot_query(
+    "SELECT id, username, password_hash, is_active FROM users WHERE username = $1"
+)
+
 
 @router.post("/register", response_model=Token)
 async def register(user: UserCreate):
@@ -24,10 +32,7 @@ async def register(user: UserCreate):
             detail="Password must be at least 6 characters long",
         )
 
-    existing_user = await db.fetchrow(
-        "SELECT id FROM users WHERE username = $1",
-        user.username,
-    )
+    existing_user = await db.fetchrow(USERNAME_EXISTS_SQL, user.username)
 
     if existing_user:
         raise HTTPException(
@@ -35,7 +40,8 @@ async def register(user: UserCreate):
             detail="Username already exists",
         )
 
-    password_hash = get_password_hash(user.password)
+    # bcrypt is CPU-bound; keep it off the event loop
+    password_hash = await asyncio.to_thread(get_password_hash, user.password)
 
     try:
         user_id = await db.fetchval(
@@ -69,12 +75,16 @@ async def register(user: UserCreate):
 
 @router.post("/login", response_model=Token)
 async def login(credentials: UserLogin):
-    user = await db.fetchrow(
-        "SELECT id, username, password_hash, is_active FROM users WHERE username = $1",
-        credentials.username,
+    user = await db.fetchrow(LOGIN_USER_SQL, credentials.username)
+
+    # Always run one bcrypt check, so unknown usernames can't be told apart by timing
+    password_ok = await asyncio.to_thread(
+        verify_password,
+        credentials.password,
+        user['password_hash'] if user else DUMMY_HASH,
     )
 
-    if not user:
+    if not user or not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid username or password",
@@ -86,15 +96,10 @@ async def login(credentials: UserLogin):
             detail="Account is deactivated",
         )
 
-    if not verify_password(credentials.password, user['password_hash']):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid username or password",
-        )
-
-    await db.execute(
-        "UPDATE users SET last_login = NOW() WHERE id = $1",
-        user['id'],
+    # Don't hold the response for the last_login bookkeeping write
+    spawn(
+        db.execute("UPDATE users SET last_login = NOW() WHERE id = $1", user['id']),
+        name="update-last-login",
     )
 
     access_token_expires = timedelta(minutes=settings.access_token_expire_minutes)
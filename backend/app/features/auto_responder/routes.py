@@ -1,36 +1,126 @@
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File
-from typing import List
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Response
+from functools import lru_cache
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
 from app.core.database import db
 from app.core.security import get_current_user
+from app.core.cache import TTLCache
+from app.core.responses import RecordJSONResponse
 from models import (
     AutoResponderRuleCreate,
     AutoResponderRuleUpdate,
     AutoResponderRuleResponse,
     AutoResponderLogResponse,
 )
+import asyncio
 import logging
 import os
+import uuid
+import aiofiles
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/auto-responder", tags=["auto-responder"])
 
+# Columns returned for a rule (matches AutoResponderRuleResponse)
+RULE_COLUMNS = """
+    id, user_id, name, keywords, response_text, language,
+    media_type, media_file_path, is_active, priority,
+    created_at, updated_at
+"""
+
+# Rendered get_rules bodies per user, dropped whenever one of their rules changes
+RULES_CACHE_TTL = 10
+_rules_cache = TTLCache(ttl=RULES_CACHE_TTL, maxsize=4096)
+
+# Rule media type for each accepted top-level MIME type
+MEDIA_TYPE_BY_MIME_TOPLEVEL = {
+    "image": "photo",
+    "video": "video",
+}
+
+# Uploads are copied to disk in pieces of this size, never held whole in memory
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Per-user media directories already created by this process (reset when full)
+KNOWN_MEDIA_DIRS_MAX = 4096
+_known_media_dirs: Set[str] = set()
+
+# Fields of AutoResponderRuleUpdate that map onto rule columns
+RULE_UPDATE_COLUMNS = (
+    "name", "keywords", "response_text", "language",
+    "media_type", "priority", "is_active",
+)
+
+
+@lru_cache(maxsize=None)
+def _build_rule_update_sql(columns: Tuple[str, ...]) -> str:
+    """UPDATE for the given columns; ownership is part of the WHERE clause"""
+    assignments = ", ".join(
+        f"{column} = ${index}" for index, column in enumerate(columns, start=1)
+    )
+    id_param = len(columns) + 1
+    return f"""
+        UPDATE auto_responder_rules
+        SET {assignments}, updated_at = NOW()
+        WHERE id = ${id_param} AND user_id = ${id_param + 1}
+        RETURNING {RULE_COLUMNS}
+    """
+
+
+def _remove_media_file(path: str):
+    """Delete a stored media file if it exists (blocking; run it in a thread)"""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+RULES_BY_USER_SQL = db.register_hot_query(
+    f"""
+    SELECT {RULE_COLUMNS}
+    FROM auto_responder_rules
+    WHERE user_id = $1
+    ORDER BY priority DESC, created_at DESC
+    """
+)
+
+LOGS_BY_USER_SQL = db.register_hot_query(
+    """
+    SELECT l.id, l.rule_id, r.name as rule_name, l.conversation_id,
+           c.title as conversation_title, l.matched_keyword, l.triggered_at
+    FROM auto_responder_logs l
+    JOIN auto_responder_rules r ON l.rule_id = r.id
+    JOIN conversations c ON l.conversation_id = c.id
+    WHERE r.user_id = $1
+    ORDER BY l.triggered_at DESC, l.id DESC
+    LIMIT $2
+    """
+)
+
+# Next page back from a known (triggered_at, id)
+OLDER_LOGS_BY_USER_SQL = db.register_hot_query(
+    """
+    SELECT l.id, l.rule_id, r.name as rule_name, l.conversation_id,
+           c.title as conversation_title, l.matched_keyword, l.triggered_at
+    FROM auto_responder_logs l
+    JOIN auto_responder_rules r ON l.rule_id = r.id
+    JOIN conversations c ON l.conversation_id = c.id
+    WHERE r.user_id = $1 AND (l.triggered_at, l.id) < ($2, $3)
+    ORDER BY l.triggered_at DESC, l.id DESC
+    LIMIT $4
+    """
+)
+
 
 @router.get("/rules", response_model=List[AutoResponderRuleResponse])
 async def get_rules(current_user = Depends(get_current_user)):
     """Get all auto-responder rules for the current user"""
-    rules = await db.fetch(
-        """
-        SELECT id, user_id, name, keywords, response_text, language,
-               media_type, media_file_path, is_active, priority,
-               created_at, updated_at
-        FROM auto_responder_rules
-        WHERE user_id = $1
-        ORDER BY priority DESC, created_at DESC
-        """,
-        current_user.user_id,
-    )
-    
-    return [dict(rule) for rule in rules]
+    body = _rules_cache.get(current_user.user_id)
+    if body is None:
+        rules = await db.fetch(RULES_BY_USER_SQL, current_user.user_id)
+        # Rows go straight to JSON; the response model documents the shape
+        body = RecordJSONResponse(rules).body
+        _rules_cache.set(current_user.user_id, body)
+    
+    return Response(content=body, media_type="application/json")
 
 
 @router.post("/rules", response_model=AutoResponderRuleResponse)
@@ -39,12 +129,12 @@ async def create_rule(
     current_user = Depends(get_current_user),
 ):
     """Create a new auto-responder rule"""
-    rule_id = await db.fetchval(
-        """
+    created_rule = await db.fetchrow(
+        f"""
         INSERT INTO auto_responder_rules
         (user_id, name, keywords, response_text, language, media_type, priority, is_active)
         VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-        RETURNING id
+        RETURNING {RULE_COLUMNS}
         """,
         current_user.user_id,
         rule.name,
@@ -55,18 +145,9 @@ async def create_rule(
         rule.priority,
         rule.is_active,
     )
+    rule_id = created_rule['id']
     
-    created_rule = await db.fetchrow(
-        """
-        SELECT id, user_id, name, keywords, response_text, language,
-               media_type, media_file_path, is_active, priority,
-               created_at, updated_at
-        FROM auto_responder_rules
-        WHERE id = $1
-        """,
-        rule_id,
-    )
-    
+    _rules_cache.pop(current_user.user_id)
     logger.info(f"Created auto-responder rule {rule_id} for user {current_user.user_id}")
     return dict(created_rule)
 
@@ -78,86 +159,33 @@ async def update_rule(
     current_user = Depends(get_current_user),
 ):
     """Update an auto-responder rule"""
-    # Verify rule belongs to user
-    existing = await db.fetchrow(
-        "SELECT id FROM auto_responder_rules WHERE id = $1 AND user_id = $2",
-        rule_id,
-        current_user.user_id,
+    # Columns are taken in RULE_UPDATE_COLUMNS order, so equal sets share one SQL string
+    columns = tuple(
+        column for column in RULE_UPDATE_COLUMNS
+        if getattr(rule_update, column) is not None
     )
     
-    if not existing:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Rule not found",
-        )
-    
-    # Build update query dynamically
-    updates = []
-    values = []
-    param_count = 1
-    
-    if rule_update.name is not None:
-        updates.append(f"name = ${param_count}")
-        values.append(rule_update.name)
-        param_count += 1
-    
-    if rule_update.keywords is not None:
-        updates.append(f"keywords = ${param_count}")
-        values.append(rule_update.keywords)
-        param_count += 1
-    
-    if rule_update.response_text is not None:
-        updates.append(f"response_text = ${param_count}")
-        values.append(rule_update.response_text)
-        param_count += 1
-    
-    if rule_update.language is not None:
-        updates.append(f"language = ${param_count}")
-        values.append(rule_update.language)
-        param_count += 1
-    
-    if rule_update.media_type is not None:
-        updates.append(f"media_type = ${param_count}")
-        values.append(rule_update.media_type)
-        param_count += 1
-    
-    if rule_update.priority is not None:
-        updates.append(f"priority = ${param_count}")
-        values.append(rule_update.priority)
-        param_count += 1
-    
-    if rule_update.is_active is not None:
-        updates.append(f"is_active = ${param_count}")
-        values.append(rule_update.is_active)
-        param_count += 1
-    
-    if not updates:
+    if not columns:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No fields to update",
         )
     
-    updates.append(f"updated_at = NOW()")
+    values = [getattr(rule_update, column) for column in columns]
     values.append(rule_id)
+    values.append(current_user.user_id)
     
-    query = f"""
-        UPDATE auto_responder_rules
-        SET {', '.join(updates)}
-        WHERE id = ${param_count}
-    """
+    query = _build_rule_update_sql(columns)
     
-    await db.execute(query, *values)
+    updated_rule = await db.fetchrow(query, *values)
     
-    updated_rule = await db.fetchrow(
-        """
-        SELECT id, user_id, name, keywords, response_text, language,
-               media_type, media_file_path, is_active, priority,
-               created_at, updated_at
-        FROM auto_responder_rules
-        WHERE id = $1
-        """,
-        rule_id,
-    )
+    if not updated_rule:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Rule not found",
+        )
+    
+    _rules_cache.pop(current_user.user_id)
     
     logger.info(f"Updated auto-responder rule {rule_id}")
     return dict(updated_rule)
@@ -169,31 +197,27 @@ async def delete_rule(
     current_user = Depends(get_current_user),
 ):
     """Delete an auto-responder rule"""
-    # Verify rule belongs to user
-    existing = await db.fetchrow(
-        "SELECT id, media_file_path FROM auto_responder_rules WHERE id = $1 AND user_id = $2",
+    # Delete only if the rule belongs to the user
+    deleted = await db.fetchrow(
+        "DELETE FROM auto_responder_rules WHERE id = $1 AND user_id = $2 RETURNING media_file_path",
         rule_id,
         current_user.user_id,
     )
     
-    if not existing:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Rule not found",
         )
     
     # Delete media file if exists
-    if existing['media_file_path'] and os.path.exists(existing['media_file_path']):
+    if deleted['media_file_path']:
         try:
-            os.remove(existing['media_file_path'])
+            await asyncio.to_thread(_remove_media_file, deleted['media_file_path'])
         except Exception as e:
             logger.error(f"Failed to delete media file: {e}")
     
-    await db.execute(
-        "DELETE FROM auto_responder_rules WHERE id = $1",
-        rule_id,
-    )
-    
+    _rules_cache.pop(current_user.user_id)
     logger.info(f"Deleted auto-responder rule {rule_id}")
     return {"message": "Rule deleted successfully"}
 
@@ -201,25 +225,27 @@ async def delete_rule(
 @router.get("/logs", response_model=List[AutoResponderLogResponse])
 async def get_logs(
     limit: int = 50,
+    before_triggered_at: Optional[datetime] = None,
+    before_id: Optional[int] = None,
     current_user = Depends(get_current_user),
 ):
-    """Get auto-responder trigger logs for the current user"""
-    logs = await db.fetch(
-        """
-        SELECT l.id, l.rule_id, r.name as rule_name, l.conversation_id,
-               c.title as conversation_title, l.matched_keyword, l.triggered_at
-        FROM auto_responder_logs l
-        JOIN auto_responder_rules r ON l.rule_id = r.id
-        JOIN conversations c ON l.conversation_id = c.id
-        WHERE r.user_id = $1
-        ORDER BY l.triggered_at DESC
-        LIMIT $2
-        """,
-        current_user.user_id,
-        limit,
-    )
+    """Get auto-responder trigger logs for the current user
     
-    return [dict(log) for log in logs]
+    Pass the triggered_at and id of the oldest log already loaded as
+    before_triggered_at/before_id to fetch the next page.
+    """
+    if before_triggered_at is not None and before_id is not None:
+        logs = await db.fetch(
+            OLDER_LOGS_BY_USER_SQL,
+            current_user.user_id,
+            before_triggered_at,
+            before_id,
+            limit,
+        )
+    else:
+        logs = await db.fetch(LOGS_BY_USER_SQL, current_user.user_id, limit)
+    
+    return RecordJSONResponse(logs)
 
 
 @router.post("/rules/{rule_id}/upload-media")
@@ -229,62 +255,75 @@ async def upload_media(
     current_user = Depends(get_current_user),
 ):
     """Upload media file for an auto-responder rule"""
-    # Verify rule belongs to user
-    existing = await db.fetchrow(
-        "SELECT id, media_file_path FROM auto_responder_rules WHERE id = $1 AND user_id = $2",
-        rule_id,
-        current_user.user_id,
-    )
-    
-    if not existing:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Rule not found",
-        )
-    
     # Validate file type
     content_type = media.content_type or ""
-    if content_type.startswith("image/"):
-        media_type = "photo"
-    elif content_type.startswith("video/"):
-        media_type = "video"
-    else:
+    media_type = MEDIA_TYPE_BY_MIME_TOPLEVEL.get(content_type.split("/", 1)[0])
+    if media_type is None:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Only image and video files are supported",
         )
     
-    # Create media directory
     media_dir = f"media/auto_responder/{current_user.user_id}"
-    os.makedirs(media_dir, exist_ok=True)
-    
-    # Delete old media file if exists
-    if existing['media_file_path'] and os.path.exists(existing['media_file_path']):
-        try:
-            os.remove(existing['media_file_path'])
-        except Exception as e:
-            logger.error(f"Failed to delete old media file: {e}")
-    
-    # Save new media file
     file_extension = os.path.splitext(media.filename)[1] if media.filename else ""
     file_path = f"{media_dir}/{rule_id}{file_extension}"
     
-    with open(file_path, "wb") as f:
-        content = await media.read()
-        f.write(content)
-    
-    # Update rule with media info
-    await db.execute(
+    # Write the upload to a temp file next to its final path and move it into
+    # place only once complete, so a failed upload never leaves a partial file
+    if media_dir not in _known_media_dirs:
+        await asyncio.to_thread(os.makedirs, media_dir, exist_ok=True)
+        if len(_known_media_dirs) >= KNOWN_MEDIA_DIRS_MAX:
+            _known_media_dirs.clear()
+        _known_media_dirs.add(media_dir)
+    temp_path = f"{media_dir}/.{rule_id}-{uuid.uuid4().hex}.part"
+    try:
+        async with aiofiles.open(temp_path, "wb") as f:
+            while chunk := await media.read(UPLOAD_CHUNK_SIZE):
+                await f.write(chunk)
+        await asyncio.to_thread(os.replace, temp_path, file_path)
+    except BaseException:
+        # Also on cancellation (client gone), hence the plain blocking unlink
+        _remove_media_file(temp_path)
+        raise
+    
+    # Update rule with media info, checking ownership and reading the
+    # previous file path in the same statement
+    updated = await db.fetchrow(
         """
-        UPDATE auto_responder_rules
+        UPDATE auto_responder_rules r
         SET media_type = $1, media_file_path = $2, updated_at = NOW()
-        WHERE id = $3
+        FROM (
+            SELECT id, media_file_path FROM auto_responder_rules
+            WHERE id = $3 AND user_id = $4
+            FOR UPDATE
+        ) old
+        WHERE r.id = old.id
+        RETURNING old.media_file_path AS old_media_file_path
         """,
         media_type,
         file_path,
         rule_id,
+        current_user.user_id,
     )
     
+    if not updated:
+        # Not the user's rule, so nothing of theirs points at the file
+        await asyncio.to_thread(_remove_media_file, file_path)
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Rule not found",
+        )
+    
+    _rules_cache.pop(current_user.user_id)
+    
+    # Delete old media file if it was replaced by a differently named one
+    old_path = updated['old_media_file_path']
+    if old_path and old_path != file_path:
+        try:
+            await asyncio.to_thread(_remove_media_file, old_path)
+        except Exception as e:
+            logger.error(f"Failed to delete old media file: {e}")
+    
     logger.info(f"Uploaded media for auto-responder rule {rule_id}")
     return {"message": "Media uploaded successfully", "media_type": media_type, "file_path": file_path}
 
@@ -295,35 +334,38 @@ async def delete_media(
     current_user = Depends(get_current_user),
 ):
     """Delete media file from an auto-responder rule"""
-    # Verify rule belongs to user
-    existing = await db.fetchrow(
-        "SELECT id, media_file_path FROM auto_responder_rules WHERE id = $1 AND user_id = $2",
+    # Update rule to remove media info, checking ownership and reading the
+    # previous file path in the same statement
+    updated = await db.fetchrow(
+        """
+        UPDATE auto_responder_rules r
+        SET media_type = NULL, media_file_path = NULL, updated_at = NOW()
+        FROM (
+            SELECT id, media_file_path FROM auto_responder_rules
+            WHERE id = $1 AND user_id = $2
+            FOR UPDATE
+        ) old
+        WHERE r.id = old.id
+        RETURNING old.media_file_path AS old_media_file_path
+        """,
         rule_id,
         current_user.user_id,
     )
     
-    if not existing:
+    if not updated:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Rule not found",
         )
     
     # Delete media file if exists
-    if existing['media_file_path'] and os.path.exists(existing['media_file_path']):
+    old_path = updated['old_media_file_path']
+    if old_path:
         try:
-            os.remove(existing['media_file_path'])
+            await asyncio.to_thread(_remove_media_file, old_path)
         except Exception as e:
             logger.error(f"Failed to delete media file: {e}")
     
-    # Update rule to remove media info
-    await db.execute(
-        """
-        UPDATE auto_responder_rules
-        SET media_type = NULL, media_file_path = NULL, updated_at = NOW()
-        WHERE id = $1
-        """,
-        rule_id,
-    )
-    
+    _rules_cache.pop(current_user.user_id)
     logger.info(f"Deleted media from auto-responder rule {rule_id}")
     return {"message": "Media deleted successfully"}
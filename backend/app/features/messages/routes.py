@@ -1,85 +1,127 @@
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Form
+from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Form, Header
 from fastapi.responses import FileResponse
-from typing import List
+from typing import Dict, List, Optional
 from datetime import datetime
+from app.core.cache import TTLCache
 from app.core.database import db
 from app.core.security import get_current_user
-from app.core.encryption import encrypt_message_if_enabled, decrypt_message_if_encrypted
+from app.core.conversation_cache import get_owned_conversation
+from app.core.encryption import encrypt_message_if_enabled, decrypt_messages_if_encrypted
+from app.core.media_cache import lookup_cached_media, store_downloaded_media, media_type_for
+from app.core.responses import RecordJSONResponse
+from app.core.tasks import spawn
 from models import MessageResponse, MessageSend
 from telethon_service import telethon_service
 from translation_service import translation_service
 from websocket_manager import manager
+import asyncio
 import logging
 import os
-import aiofiles
 
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/messages", tags=["messages"])
 
+CONVERSATION_OWNED_SQL = db.register_hot_query(
+    """
+    SELECT 1 FROM conversations c
+    JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
+    WHERE c.id = $1 AND ta.user_id = $2
+    """
+)
+
+# Columns get_messages returns; is_encrypted is also needed for decryption
+MESSAGE_LIST_COLUMNS = """
+    id, conversation_id, telegram_message_id, sender_user_id, sender_name,
+    sender_username, type, original_text, translated_text, source_language,
+    target_language, created_at, edited_at, is_outgoing, media_file_name,
+    is_encrypted
+"""
+
+# The ownership test doesn't depend on the row, so Postgres runs it once as a
+# one-time filter; an empty result then needs CONVERSATION_OWNED_SQL to tell
+# "not yours" from "no messages"
+OWNED_CONVERSATION_FILTER = """
+    EXISTS (
+        SELECT 1 FROM conversations c
+        JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
+        WHERE c.id = $1 AND ta.user_id = $2
+    )
+"""
+
+RECENT_MESSAGES_SQL = db.register_hot_query(
+    f"""
+    SELECT {MESSAGE_LIST_COLUMNS} FROM messages
+    WHERE conversation_id = $1 AND {OWNED_CONVERSATION_FILTER}
+    ORDER BY created_at DESC, id DESC
+    LIMIT $3
+    """
+)
+
+# Next page back from a known (created_at, id), seeking into idx_messages_conversation_created
+OLDER_MESSAGES_SQL = db.register_hot_query(
+    f"""
+    SELECT {MESSAGE_LIST_COLUMNS} FROM messages
+    WHERE conversation_id = $1 AND {OWNED_CONVERSATION_FILTER}
+      AND (created_at, id) < ($3, $4)
+    ORDER BY created_at DESC, id DESC
+    LIMIT $5
+    """
+)
+
+# Media sends already delivered, by (user, conversation, Idempotency-Key header),
+# so a client retrying after a lost response gets the original message back
+# instead of a second upload and a duplicate in the chat. Sends without the
+# header are never deduplicated: the same file twice on purpose is two messages.
+MEDIA_RETRY_WINDOW = 120
+_recent_media_sends = TTLCache(ttl=MEDIA_RETRY_WINDOW, maxsize=1024)
+
+# Keyed sends still running, so a concurrent retry waits instead of sending again
+_media_sends_in_flight: Dict[tuple, asyncio.Future] = {}
+
+# Content type browsers send when they don't know the file's type
+GENERIC_MIME_TYPE = "application/octet-stream"
+
 
 @router.get("/conversations/{conversation_id}/messages", response_model=List[MessageResponse])
 async def get_messages(
     conversation_id: int,
     limit: int = 50,
+    before_created_at: Optional[datetime] = None,
+    before_id: Optional[int] = None,
     current_user = Depends(get_current_user),
 ):
-    conversation = await db.fetchrow(
-        """
-        SELECT c.*, ta.user_id FROM conversations c
-        JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
-        WHERE c.id = $1
-        """,
-        conversation_id,
-    )
-
-    if not conversation or conversation['user_id'] != current_user.user_id:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Conversation not found",
+    """Pass the created_at and id of the oldest message already loaded as
+    before_created_at/before_id to page backwards without an OFFSET scan."""
+    if before_created_at is not None and before_id is not None:
+        messages = await db.fetch(
+            OLDER_MESSAGES_SQL,
+            conversation_id,
+            current_user.user_id,
+            before_created_at,
+            before_id,
+            limit,
+        )
+    else:
+        messages = await db.fetch(
+            RECENT_MESSAGES_SQL, conversation_id, current_user.user_id, limit
         )
 
-    messages = await db.fetch(
-        """
-        SELECT * FROM messages
-        WHERE conversation_id = $1
-        ORDER BY created_at DESC
-        LIMIT $2
-        """,
-        conversation_id,
-        limit,
-    )
+    if not messages:
+        owned = await db.fetchval(CONVERSATION_OWNED_SQL, conversation_id, current_user.user_id)
+        if not owned:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Conversation not found",
+            )
 
-    result = []
-    for msg in messages:
-        # Ensure created_at is not None - use current time if it's None
-        created_at = msg['created_at'] if msg['created_at'] is not None else datetime.now()
-        
-        # Decrypt message if encrypted
-        is_encrypted = msg.get('is_encrypted', False)
-        original_text, translated_text = await decrypt_message_if_encrypted(
-            is_encrypted, msg['original_text'], msg['translated_text']
-        )
-        
-        result.append({
-            "id": msg['id'],
-            "conversation_id": msg['conversation_id'],
-            "telegram_message_id": msg['telegram_message_id'],
-            "sender_user_id": msg['sender_user_id'],
-            "sender_name": msg['sender_name'],
-            "sender_username": msg['sender_username'],
-            "type": msg['type'],
-            "original_text": original_text,
-            "translated_text": translated_text,
-            "source_language": msg['source_language'],
-            "target_language": msg['target_language'],
-            "created_at": created_at,
-            "edited_at": msg['edited_at'],
-            "is_outgoing": msg.get('is_outgoing', False),
-            "media_file_name": msg.get('media_file_name'),
-        })
+    # Decrypt all encrypted messages in one batch off the event loop
+    messages = list(messages)
+    await decrypt_messages_if_encrypted(messages)
 
-    return result
+    # The query already projects the response columns (created_at is NOT NULL),
+    # so rows go straight to JSON; the response model documents the shape
+    return RecordJSONResponse(messages)
 
 
 @router.post("/send", response_model=MessageResponse)
@@ -87,17 +129,9 @@ async def send_message(
     message_data: MessageSend,
     current_user = Depends(get_current_user),
 ):
-    conversation = await db.fetchrow(
-        """
-        SELECT c.*, ta.user_id, ta.target_language, ta.source_language
-        FROM conversations c
-        JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
-        WHERE c.id = $1
-        """,
-        message_data.conversation_id,
-    )
+    conversation = await get_owned_conversation(message_data.conversation_id, current_user.user_id)
 
-    if not conversation or conversation['user_id'] != current_user.user_id:
+    if not conversation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Conversation not found",
@@ -126,13 +160,19 @@ async def send_message(
             db, original_text, translated_text
         )
 
-        message_id = await db.fetchval(
+        # Store the message and bump the conversation in one statement
+        inserted = await db.fetchrow(
             """
-            INSERT INTO messages
-            (conversation_id, telegram_message_id, sender_user_id, sender_name, sender_username, type, original_text, translated_text,
-             source_language, target_language, created_at, is_encrypted)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
-            RETURNING id
+            WITH inserted AS (
+                INSERT INTO messages
+                (conversation_id, telegram_message_id, sender_user_id, sender_name, sender_username, type, original_text, translated_text,
+                 source_language, target_language, created_at, is_encrypted)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
+                RETURNING id, created_at
+            ), touched AS (
+                UPDATE conversations SET last_message_at = $11 WHERE id = $1
+            )
+            SELECT id, created_at FROM inserted
             """,
             message_data.conversation_id,
             sent_message['message_id'],
@@ -148,14 +188,8 @@ async def send_message(
             is_encrypted,
         )
 
-        await db.execute(
-            "UPDATE conversations SET last_message_at = $1 WHERE id = $2",
-            sent_message['date'],
-            message_data.conversation_id,
-        )
-
         message_response = {
-            "id": message_id,
+            "id": inserted['id'],
             "conversation_id": message_data.conversation_id,
             "telegram_message_id": sent_message['message_id'],
             "sender_user_id": sent_message['sender_user_id'],
@@ -167,21 +201,26 @@ async def send_message(
             "translated_text": translated_text,
             "source_language": conversation['target_language'],
             "target_language": conversation['source_language'],
-            "created_at": sent_message['date'].isoformat() if sent_message['date'] else None,
+            "created_at": inserted['created_at'],
             "edited_at": None,
             "is_outgoing": True,
         }
 
-        await manager.send_to_account(
-            {
-                "type": "new_message",
-                "message": message_response,
-            },
-            conversation['telegram_account_id'],
-            current_user.user_id,
+        # The sender gets the response without waiting on the WebSocket fan-out
+        spawn(
+            manager.send_to_account(
+                {
+                    "type": "new_message",
+                    "message": message_response,
+                },
+                conversation['telegram_account_id'],
+                current_user.user_id,
+            ),
+            name="broadcast-sent-message",
         )
 
-        return message_response
+        # Serialized as-is; the response model only documents the shape
+        return RecordJSONResponse(message_response)
 
     except Exception as e:
         logger.error(f"Error sending message: {e}")
@@ -207,31 +246,47 @@ async def translate_message(
     return translation
 
 
-@router.post("/send-media")
+@router.post("/send-media", response_model=MessageResponse)
 async def send_media(
     conversation_id: int = Form(...),
     file: UploadFile = File(...),
     caption: str = Form(""),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     current_user = Depends(get_current_user),
 ):
-    """Send a media file (photo, video, document) to a conversation"""
-    conversation = await db.fetchrow(
-        """
-        SELECT c.*, ta.user_id, ta.target_language, ta.source_language
-        FROM conversations c
-        JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
-        WHERE c.id = $1
-        """,
-        conversation_id,
-    )
+    """Send a media file (photo, video, document) to a conversation
 
-    if not conversation or conversation['user_id'] != current_user.user_id:
+    A client that may retry sends the same Idempotency-Key header each time;
+    a repeat within MEDIA_RETRY_WINDOW seconds returns the first send's message.
+    """
+    conversation = await get_owned_conversation(conversation_id, current_user.user_id)
+
+    if not conversation:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Conversation not found",
         )
 
+    send_key = None
+    in_flight = None
     try:
+        # A retry of a send that already went through is answered from the
+        # cache; one that races the original waits for the original's result
+        if idempotency_key:
+            send_key = (current_user.user_id, conversation_id, idempotency_key)
+            previous = _recent_media_sends.get(send_key)
+            if previous is None:
+                pending = _media_sends_in_flight.get(send_key)
+                if pending is not None:
+                    previous = await asyncio.shield(pending)
+                    if previous is None:
+                        raise Exception("the original send with this Idempotency-Key failed")
+            if previous is not None:
+                logger.info(f"Media send to conversation {conversation_id} already delivered, returning it")
+                return RecordJSONResponse(previous)
+            in_flight = asyncio.get_running_loop().create_future()
+            _media_sends_in_flight[send_key] = in_flight
+        
         # Translate caption if provided
         original_caption = caption
         translated_caption = caption
@@ -246,21 +301,25 @@ async def send_media(
             translated_caption = translation['translated_text']
             source_lang = translation['source_language']
         
-        # Create uploads directory if it doesn't exist
-        os.makedirs("temp/uploads", exist_ok=True)
+        # Client-supplied name: keep only the final path component (either
+        # separator) before it reaches Telegram or the database
+        file_name = os.path.basename((file.filename or "").replace("\\", "/")) or "file"
+        # The browser's content type is a better hint than the extension;
+        # the generic fallback tells Telethon nothing, so it guesses instead
+        mime_type = file.content_type
+        if mime_type == GENERIC_MIME_TYPE:
+            mime_type = None
         
-        # Save uploaded file temporarily
-        file_path = f"temp/uploads/{file.filename}"
-        async with aiofiles.open(file_path, 'wb') as out_file:
-            content = await file.read()
-            await out_file.write(content)
-        
-        # Send media via Telethon with translated caption
+        # Send media via Telethon with translated caption, uploading straight
+        # from the request's spooled file rather than copying it to disk first
+        await file.seek(0)
         sent_message = await telethon_service.send_media(
             conversation['telegram_account_id'],
             conversation['telegram_peer_id'],
-            file_path,
-            translated_caption
+            file.file,
+            translated_caption,
+            file_name=file_name,
+            mime_type=mime_type,
         )
         
         # Encrypt caption if encryption is enabled
@@ -268,14 +327,20 @@ async def send_media(
             db, original_caption, translated_caption
         )
         
-        # Save message to database with both original and translated caption
-        message_id = await db.fetchval(
+        # Save message with both original and translated caption, bumping the
+        # conversation in the same statement
+        inserted = await db.fetchrow(
             """
-            INSERT INTO messages
-            (conversation_id, telegram_message_id, sender_user_id, sender_name, sender_username, type,
-             original_text, translated_text, source_language, target_language, created_at, is_outgoing, media_file_name, is_encrypted)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
-            RETURNING id
+            WITH inserted AS (
+                INSERT INTO messages
+                (conversation_id, telegram_message_id, sender_user_id, sender_name, sender_username, type,
+                 original_text, translated_text, source_language, target_language, created_at, is_outgoing, media_file_name, is_encrypted)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14)
+                RETURNING id, created_at
+            ), touched AS (
+                UPDATE conversations SET last_message_at = $11 WHERE id = $1
+            )
+            SELECT id, created_at FROM inserted
             """,
             conversation_id,
             sent_message['message_id'],
@@ -289,21 +354,12 @@ async def send_media(
             conversation['source_language'],
             sent_message['date'],
             True,
-            file.filename,
+            file_name,
             is_encrypted
         )
         
-        await db.execute(
-            "UPDATE conversations SET last_message_at = $1 WHERE id = $2",
-            sent_message['date'],
-            conversation_id,
-        )
-        
-        # Clean up temp file
-        os.remove(file_path)
-        
         message_response = {
-            "id": message_id,
+            "id": inserted['id'],
             "conversation_id": conversation_id,
             "telegram_message_id": sent_message['message_id'],
             "sender_user_id": sent_message['sender_user_id'],
@@ -314,31 +370,42 @@ async def send_media(
             "translated_text": translated_caption,
             "source_language": source_lang,
             "target_language": conversation['source_language'],
-            "created_at": sent_message['date'].isoformat() if sent_message['date'] else None,
+            "created_at": inserted['created_at'],
             "is_outgoing": True,
-            "media_file_name": file.filename,
+            "media_file_name": file_name,
         }
         
-        await manager.send_to_account(
-            {
-                "type": "new_message",
-                "message": message_response,
-            },
-            conversation['telegram_account_id'],
-            current_user.user_id,
+        if in_flight is not None:
+            _recent_media_sends.set(send_key, message_response)
+            in_flight.set_result(message_response)
+        
+        # The sender gets the response without waiting on the WebSocket fan-out
+        spawn(
+            manager.send_to_account(
+                {
+                    "type": "new_message",
+                    "message": message_response,
+                },
+                conversation['telegram_account_id'],
+                current_user.user_id,
+            ),
+            name="broadcast-sent-message",
         )
         
-        return message_response
+        return RecordJSONResponse(message_response)
         
     except Exception as e:
         logger.error(f"Error sending media: {e}")
-        # Clean up temp file if it exists
-        if os.path.exists(file_path):
-            os.remove(file_path)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to send media: {str(e)}",
         )
+    finally:
+        if in_flight is not None:
+            _media_sends_in_flight.pop(send_key, None)
+            if not in_flight.done():
+                # Failed or cancelled; waiting retries get None and fail too
+                in_flight.set_result(None)
 
 
 @router.get("/download-media/{conversation_id}/{message_id}")
@@ -370,24 +437,23 @@ async def download_media(
         )
 
     try:
-        # Create structured downloads directory
+        # Structured downloads directory
         download_dir = f"temp/downloads/{conversation_id}"
-        os.makedirs(download_dir, exist_ok=True)
         
         # Use telegram_message_id as base filename to avoid conflicts
         # (multiple files can have the same name)
         base_filename = str(telegram_message_id)
         download_path = os.path.join(download_dir, base_filename)
         
-        # Check if file already exists (with any extension) to avoid re-downloading
+        # Check if file already exists to avoid re-downloading
         # Telethon adds extensions like .mp4, .jpg, etc.
-        existing_files = [f for f in os.listdir(download_dir) if f.startswith(base_filename)]
+        # (filesystem work runs in a thread, off the event loop)
+        cached = await asyncio.to_thread(lookup_cached_media, download_dir, base_filename)
         
-        if existing_files:
+        if cached:
             # Use the existing cached file
-            cached_file = os.path.join(download_dir, existing_files[0])
-            logger.info(f"Using cached media file: {cached_file}")
-            file_path = cached_file
+            file_path, stat_result = cached
+            logger.info(f"Using cached media file: {file_path}")
         else:
             # Download media via Telethon
             logger.info(f"Downloading media for message {telegram_message_id}")
@@ -398,7 +464,16 @@ async def download_media(
                 download_path
             )
             
-            if not file_path or not os.path.exists(file_path):
+            stat_result = None
+            if file_path:
+                try:
+                    stat_result = await asyncio.to_thread(
+                        store_downloaded_media, download_dir, base_filename, file_path
+                    )
+                except FileNotFoundError:
+                    pass
+            
+            if stat_result is None:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="Media file not found",
@@ -410,7 +485,8 @@ async def download_media(
         return FileResponse(
             path=file_path,
             filename=filename,
-            media_type='application/octet-stream'
+            media_type=media_type_for(file_path),
+            stat_result=stat_result
         )
         
     except HTTPException:
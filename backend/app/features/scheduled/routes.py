@@ -10,12 +10,102 @@ from models import (
     TokenData
 )
 from scheduler_service import scheduler_service
+from websocket_manager import manager
+from app.core.responses import RecordJSONResponse
+from app.core.tasks import spawn
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/scheduled-messages", tags=["scheduled-messages"])
 
+# Conversation if it belongs to the user
+OWNED_CONVERSATION_SQL = db.register_hot_query(
+    """
+    SELECT c.id, c.telegram_account_id
+    FROM conversations c
+    JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
+    WHERE c.id = $1 AND ta.user_id = $2
+    """
+)
+
+# A scheduled message of the user's that is still pending (update and cancel)
+PENDING_SCHEDULED_MESSAGE_SQL = db.register_hot_query(
+    """
+    SELECT sm.id, sm.conversation_id, sm.message_text, sm.scheduled_at,
+           c.telegram_account_id
+    FROM scheduled_messages sm
+    JOIN conversations c ON sm.conversation_id = c.id
+    JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
+    WHERE sm.id = $1 AND ta.user_id = $2
+      AND sm.is_sent = FALSE AND sm.is_cancelled = FALSE
+    """
+)
+
+# Columns of ScheduledMessageResponse; listings return these rows as-is,
+# skipping per-row validation (the response model still documents the shape)
+SCHEDULED_MESSAGE_COLUMNS = """
+    id, conversation_id, message_text, scheduled_at, created_at, is_sent, is_cancelled
+"""
+
+# New scheduled message plus the system message announcing it; returns the
+# scheduled row with the system message id
+CREATE_SCHEDULED_MESSAGE_SQL = f"""
+    WITH scheduled AS (
+        INSERT INTO scheduled_messages (conversation_id, message_text, scheduled_at)
+        VALUES ($1, $2, $3)
+        RETURNING {SCHEDULED_MESSAGE_COLUMNS}
+    ), system_message AS (
+        INSERT INTO messages
+        (conversation_id, sender_name, sender_username, type, original_text, created_at)
+        VALUES ($1, 'System', 'system', 'system', $4, $5)
+        RETURNING id
+    )
+    SELECT scheduled.*, system_message.id AS system_message_id
+    FROM scheduled, system_message
+"""
+
+# Cancels a scheduled message and records the system message; returns its id
+CANCEL_SCHEDULED_MESSAGE_SQL = """
+    WITH cancelled AS (
+        UPDATE scheduled_messages
+        SET is_cancelled = TRUE, cancelled_at = NOW()
+        WHERE id = $1
+        RETURNING id
+    )
+    INSERT INTO messages
+    (conversation_id, sender_name, sender_username, type, original_text, created_at)
+    SELECT $2::bigint, 'System', 'system', 'system', $3::text, $4::timestamptz
+    FROM cancelled
+    RETURNING id
+"""
+
+# Ownership is checked once inside the query (an uncorrelated EXISTS)
+PENDING_BY_CONVERSATION_SQL = db.register_hot_query(
+    f"""
+    SELECT {SCHEDULED_MESSAGE_COLUMNS} FROM scheduled_messages
+    WHERE conversation_id = $1 AND is_sent = FALSE AND is_cancelled = FALSE
+      AND EXISTS (
+          SELECT 1 FROM conversations c
+          JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
+          WHERE c.id = $1 AND ta.user_id = $2
+      )
+    ORDER BY scheduled_at ASC
+    """
+)
+
+PENDING_BY_USER_SQL = db.register_hot_query(
+    """
+    SELECT sm.id, sm.conversation_id, sm.message_text, sm.scheduled_at,
+           sm.created_at, sm.is_sent, sm.is_cancelled
+    FROM scheduled_messages sm
+    JOIN conversations c ON sm.conversation_id = c.id
+    JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
+    WHERE ta.user_id = $1 AND sm.is_sent = FALSE AND sm.is_cancelled = FALSE
+    ORDER BY sm.scheduled_at ASC
+    """
+)
+
 @router.post("", response_model=ScheduledMessageResponse)
 async def create_scheduled_message(
     scheduled_msg: ScheduledMessageCreate,
@@ -25,12 +115,7 @@ async def create_scheduled_message(
     try:
         # Verify conversation belongs to user's account
         conversation = await db.fetchrow(
-            """
-            SELECT c.id, c.telegram_account_id
-            FROM conversations c
-            JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
-            WHERE c.id = $1 AND ta.user_id = $2
-            """,
+            OWNED_CONVERSATION_SQL,
             scheduled_msg.conversation_id,
             current_user.user_id
         )
@@ -41,61 +126,29 @@ async def create_scheduled_message(
         # Calculate scheduled time
         scheduled_at = datetime.now() + timedelta(days=scheduled_msg.days_delay)
         
-        # Create scheduled message
-        msg_id = await db.fetchval(
-            """
-            INSERT INTO scheduled_messages (conversation_id, message_text, scheduled_at)
-            VALUES ($1, $2, $3)
-            RETURNING id
-            """,
-            scheduled_msg.conversation_id,
-            scheduled_msg.message_text,
-            scheduled_at
-        )
-        
-        row = await db.fetchrow(
-            "SELECT * FROM scheduled_messages WHERE id = $1",
-            msg_id
-        )
-        
-        # Notify scheduler
-        await scheduler_service.add_scheduled_message(msg_id)
-        
-        # Insert system message about scheduled message being created
+        # System message about scheduled message being created
         scheduled_date = scheduled_at.strftime('%Y-%m-%d %H:%M')
         system_text = f"Scheduled message set for {scheduled_date}: \"{scheduled_msg.message_text}\""
         
         system_created_at = datetime.now()
-        system_msg_id = await db.fetchval(
-            """
-            INSERT INTO messages
-            (conversation_id, sender_name, sender_username, type, original_text, created_at)
-            VALUES ($1, $2, $3, $4, $5, $6)
-            RETURNING id
-            """,
+        
+        # Create scheduled message and its system message in one statement
+        row = await db.fetchrow(
+            CREATE_SCHEDULED_MESSAGE_SQL,
             scheduled_msg.conversation_id,
-            'System',
-            'system',
-            'system',
+            scheduled_msg.message_text,
+            scheduled_at,
             system_text,
             system_created_at
         )
+        system_msg_id = row['system_message_id']
         
-        # Get account info for WebSocket notification
-        from websocket_manager import manager
-        account_info = await db.fetchrow(
-            """
-            SELECT ta.id as account_id, ta.user_id
-            FROM conversations c
-            JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
-            WHERE c.id = $1
-            """,
-            scheduled_msg.conversation_id
-        )
+        # Notify scheduler
+        await scheduler_service.add_scheduled_message(row['id'])
         
-        if account_info:
-            # Send system message via WebSocket
-            await manager.send_to_account(
+        # Send system message via WebSocket; the response doesn't wait on the fan-out
+        spawn(
+            manager.send_to_account(
                 {
                     "type": "new_message",
                     "message": {
@@ -113,9 +166,11 @@ async def create_scheduled_message(
                         "created_at": system_created_at.isoformat(),
                     }
                 },
-                account_info['account_id'],
-                account_info['user_id']
-            )
+                conversation['telegram_account_id'],
+                current_user.user_id
+            ),
+            name="broadcast-scheduled-message-created",
+        )
         
         return ScheduledMessageResponse(**dict(row))
     except HTTPException:
@@ -131,31 +186,23 @@ async def get_scheduled_messages_by_conversation(
 ):
     """Get all scheduled messages for a conversation"""
     try:
-        # Verify conversation belongs to user
-        conversation = await db.fetchrow(
-            """
-            SELECT c.id
-            FROM conversations c
-            JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
-            WHERE c.id = $1 AND ta.user_id = $2
-            """,
+        rows = await db.fetch(
+            PENDING_BY_CONVERSATION_SQL,
             conversation_id,
             current_user.user_id
         )
         
-        if not conversation:
-            raise HTTPException(status_code=404, detail="Conversation not found")
-        
-        rows = await db.fetch(
-            """
-            SELECT * FROM scheduled_messages
-            WHERE conversation_id = $1 AND is_sent = FALSE AND is_cancelled = FALSE
-            ORDER BY scheduled_at ASC
-            """,
-            conversation_id
-        )
+        if not rows:
+            # Only an empty result needs telling "not yours" from "none pending"
+            conversation = await db.fetchrow(
+                OWNED_CONVERSATION_SQL,
+                conversation_id,
+                current_user.user_id
+            )
+            if conversation is None:
+                raise HTTPException(status_code=404, detail="Conversation not found")
         
-        return [ScheduledMessageResponse(**dict(row)) for row in rows]
+        return RecordJSONResponse(rows)
     except HTTPException:
         raise
     except Exception as e:
@@ -169,18 +216,11 @@ async def get_all_scheduled_messages(
     """Get all scheduled messages for the current user"""
     try:
         rows = await db.fetch(
-            """
-            SELECT sm.*
-            FROM scheduled_messages sm
-            JOIN conversations c ON sm.conversation_id = c.id
-            JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
-            WHERE ta.user_id = $1 AND sm.is_sent = FALSE AND sm.is_cancelled = FALSE
-            ORDER BY sm.scheduled_at ASC
-            """,
+            PENDING_BY_USER_SQL,
             current_user.user_id
         )
         
-        return [ScheduledMessageResponse(**dict(row)) for row in rows]
+        return RecordJSONResponse(rows)
     except Exception as e:
         logger.error(f"Failed to fetch all scheduled messages: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to fetch scheduled messages: {str(e)}")
@@ -195,13 +235,7 @@ async def update_scheduled_message(
     try:
         # Verify message belongs to user and is not sent/cancelled
         existing = await db.fetchrow(
-            """
-            SELECT sm.id, sm.scheduled_at
-            FROM scheduled_messages sm
-            JOIN conversations c ON sm.conversation_id = c.id
-            JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
-            WHERE sm.id = $1 AND ta.user_id = $2 AND sm.is_sent = FALSE AND sm.is_cancelled = FALSE
-            """,
+            PENDING_SCHEDULED_MESSAGE_SQL,
             message_id,
             current_user.user_id
         )
@@ -240,8 +274,7 @@ async def update_scheduled_message(
         row = await db.fetchrow(query, *values)
         
         # Update in scheduler
-        await scheduler_service.remove_scheduled_message(message_id)
-        await scheduler_service.add_scheduled_message(message_id)
+        await scheduler_service.reschedule(message_id, row)
         
         return ScheduledMessageResponse(**dict(row))
     except HTTPException:
@@ -259,14 +292,7 @@ async def cancel_scheduled_message(
     try:
         # Get scheduled message details before cancelling
         scheduled_msg = await db.fetchrow(
-            """
-            SELECT sm.id, sm.conversation_id, sm.message_text, sm.scheduled_at
-            FROM scheduled_messages sm
-            JOIN conversations c ON sm.conversation_id = c.id
-            JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
-            WHERE sm.id = $1 AND ta.user_id = $2
-            AND sm.is_sent = FALSE AND sm.is_cancelled = FALSE
-            """,
+            PENDING_SCHEDULED_MESSAGE_SQL,
             message_id,
             current_user.user_id
         )
@@ -274,51 +300,24 @@ async def cancel_scheduled_message(
         if not scheduled_msg:
             raise HTTPException(status_code=404, detail="Scheduled message not found or already sent/cancelled")
         
-        # Cancel the scheduled message
-        await db.execute(
-            """
-            UPDATE scheduled_messages
-            SET is_cancelled = TRUE, cancelled_at = NOW()
-            WHERE id = $1
-            """,
-            message_id
-        )
-        
-        # Insert system message
+        # System message about the cancellation
         scheduled_date = scheduled_msg['scheduled_at'].strftime('%Y-%m-%d %H:%M')
         system_text = f"Scheduled message manually cancelled (was scheduled for {scheduled_date}): \"{scheduled_msg['message_text']}\""
         
         created_at = datetime.now()
+        
+        # Cancel the scheduled message and insert its system message in one statement
         msg_id = await db.fetchval(
-            """
-            INSERT INTO messages
-            (conversation_id, sender_name, sender_username, type, original_text, created_at)
-            VALUES ($1, $2, $3, $4, $5, $6)
-            RETURNING id
-            """,
+            CANCEL_SCHEDULED_MESSAGE_SQL,
+            message_id,
             scheduled_msg['conversation_id'],
-            'System',
-            'system',
-            'system',
             system_text,
             created_at
         )
         
-        # Get account info for WebSocket notification
-        from websocket_manager import manager
-        account_info = await db.fetchrow(
-            """
-            SELECT ta.id as account_id, ta.user_id
-            FROM conversations c
-            JOIN telegram_accounts ta ON c.telegram_account_id = ta.id
-            WHERE c.id = $1
-            """,
-            scheduled_msg['conversation_id']
-        )
-        
-        if account_info:
-            # Send system message via WebSocket
-            await manager.send_to_account(
+        # Send system message via WebSocket; the response doesn't wait on the fan-out
+        spawn(
+            manager.send_to_account(
                 {
                     "type": "new_message",
                     "message": {
@@ -337,9 +336,11 @@ async def cancel_scheduled_message(
                         "is_outgoing": False
                     }
                 },
-                account_info['account_id'],
-                account_info['user_id']
-            )
+                scheduled_msg['telegram_account_id'],
+                current_user.user_id
+            ),
+            name="broadcast-scheduled-message-cancelled",
+        )
         
         # Remove from scheduler
         await scheduler_service.remove_scheduled_message(message_id)
@@ -2,6 +2,7 @@ from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File,
 from typing import List
 from app.core.database import db
 from app.core.security import get_current_user
+from app.core.conversation_cache import invalidate_conversation_cache
 from models import (
     TelegramAccountCreate,
     TelegramAccountResponse,
@@ -251,6 +252,8 @@ async def create_account(
                 app_hash,
                 account_id,
             )
+            # Its languages changed; cached send lookups must not keep the old ones
+            invalidate_conversation_cache()
             logger.info(f"Reactivated telegram account: {account_name} for user {current_user.user_id}")
         else:
             # Create new account
@@ -316,6 +319,7 @@ async def create_account(
                 "DELETE FROM telegram_accounts WHERE id = $1",
                 account_id
             )
+            invalidate_conversation_cache()
             if os.path.exists(session_location):
                 os.remove(session_location)
             
@@ -343,6 +347,7 @@ async def create_account(
             "DELETE FROM telegram_accounts WHERE id = $1",
             account_id
         )
+        invalidate_conversation_cache()
         if os.path.exists(session_location):
             os.remove(session_location)
         
@@ -516,6 +521,8 @@ async def update_account(
     """
 
     updated_account = await db.fetchrow(query, *values)
+    # Cached send lookups carry the account's languages
+    invalidate_conversation_cache()
 
     session = await telethon_service.get_session(account_id)
     is_connected = session.is_connected if session else False
@@ -557,6 +564,7 @@ async def delete_account(
         account_id,
         current_user.user_id,
     )
+    invalidate_conversation_cache()
 
     logger.info(f"Telegram account deleted: {account['account_name']} for user {current_user.user_id}")
 
@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
+import jwt
+from jwt import PyJWTError
 import bcrypt
+import secrets
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from config import settings
@@ -10,6 +12,11 @@ from database import db
 
 security = HTTPBearer()
 
+# Run on every authenticated request
+USER_ACTIVE_SQL = db.register_hot_query("SELECT is_active FROM users WHERE id = $1")
+# Username availability check used by registration and admin colleague creation
+USERNAME_EXISTS_SQL = db.register_hot_query("SELECT id FROM users WHERE username = $1")
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     # Bcrypt has a 72-byte limit, truncate if necessary
     password_bytes = plain_password.encode('utf-8')[:72]
@@ -22,6 +29,10 @@ def get_password_hash(password: str) -> str:
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
+# Hash of a random password, verified against when a login names an unknown user
+# so the response takes as long as a real password check
+DUMMY_HASH = get_password_hash(secrets.token_urlsafe(16))
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -55,10 +66,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             raise credentials_exception
 
         # Check if user is still active in database
-        user = await db.fetchrow(
-            "SELECT is_active FROM users WHERE id = $1",
-            user_id
-        )
+        user = await db.fetchrow(USER_ACTIVE_SQL, user_id)
         
         if not user:
             raise credentials_exception
@@ -68,5 +76,5 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
 
         token_data = TokenData(user_id=user_id, username=username)
         return token_data
-    except JWTError:
+    except PyJWTError:
         raise credentials_exception
@@ -1,21 +1,59 @@
 import asyncpg
-from typing import Optional
+import json
+import re
+from typing import List, Optional
 from app.core.config import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Hot read queries, run once on every new pool connection so their prepared
+# statements are already in asyncpg's per-connection cache for the first request
+_hot_queries: List[str] = []
+_PARAM_RE = re.compile(r"\$(\d+)")
+
+async def _warm_statement_cache(conn: asyncpg.Connection):
+    for query in _hot_queries:
+        arg_count = max((int(n) for n in _PARAM_RE.findall(query)), default=0)
+        try:
+            # Registered queries return no rows when every parameter is NULL
+            await conn.fetch(query, *([None] * arg_count))
+        except Exception as e:
+            logger.warning(f"Could not warm statement cache for query: {e}")
+
+async def _init_connection(conn: asyncpg.Connection):
+    """Decode json/jsonb results (e.g. json_agg) into Python objects"""
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name,
+            encoder=json.dumps,
+            decoder=json.loads,
+            schema="pg_catalog"
+        )
+    await _warm_statement_cache(conn)
+
 class Database:
     def __init__(self):
         self.pool: Optional[asyncpg.Pool] = None
 
+    def register_hot_query(self, query: str) -> str:
+        """
+        Have a read-only query prepared on every pool connection as it opens.
+        The query must return no rows when all its parameters are NULL.
+        Returns the query so call sites can keep using the same text.
+        """
+        if query not in _hot_queries:
+            _hot_queries.append(query)
+        return query
+
     async def connect(self):
         try:
             self.pool = await asyncpg.create_pool(
                 settings.database_url,
                 min_size=5,
                 max_size=30,
-                command_timeout=60
+                command_timeout=60,
+                init=_init_connection
             )
             logger.info("Database connection pool created successfully")
         except Exception as e:
@@ -0,0 +1,5 @@
+-- CONCURRENTLY cannot run inside a transaction block: apply this file on its own, outside BEGIN/COMMIT
+-- Composite index for keyset pagination of messages within a conversation
+-- (built concurrently so message inserts keep flowing while it builds)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_messages_conversation_created
+  ON messages(conversation_id, created_at, id);
@@ -0,0 +1,5 @@
+-- CONCURRENTLY cannot run inside a transaction block: apply this file on its own, outside BEGIN/COMMIT
+-- Per-account conversation listing ordered by recent activity
+-- (messages(conversation_id, created_at, id) from 004 already serves the per-conversation message history)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_conversations_account_last_message
+  ON conversations(telegram_account_id, last_message_at DESC NULLS LAST);
@@ -0,0 +1,69 @@
+-- Trigger-maintained message counters for the admin encryption statistics
+BEGIN;
+
+-- Block message writes so the backfill and the triggers see the same state
+LOCK TABLE messages IN SHARE ROW EXCLUSIVE MODE;
+
+-- Message counters maintained by triggers, so encryption stats don't scan messages
+CREATE TABLE IF NOT EXISTS message_counters (
+  id INTEGER PRIMARY KEY DEFAULT 1,
+  total BIGINT NOT NULL DEFAULT 0,
+  encrypted BIGINT NOT NULL DEFAULT 0,
+  CONSTRAINT single_row_check CHECK (id = 1)
+);
+
+-- Backfill from the current contents of messages
+INSERT INTO message_counters (id, total, encrypted)
+SELECT 1, COUNT(*), COUNT(*) FILTER (WHERE is_encrypted) FROM messages
+ON CONFLICT (id) DO NOTHING;
+
+-- Statement-level triggers with transition tables: one counter update per statement,
+-- so cascading deletes don't update the row once per message
+CREATE OR REPLACE FUNCTION message_counters_update() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    UPDATE message_counters c
+    SET total = c.total + d.n, encrypted = c.encrypted + d.e
+    FROM (SELECT COUNT(*) AS n, COUNT(*) FILTER (WHERE is_encrypted) AS e FROM new_rows) d
+    WHERE c.id = 1;
+  ELSIF TG_OP = 'DELETE' THEN
+    UPDATE message_counters c
+    SET total = c.total - d.n, encrypted = c.encrypted - d.e
+    FROM (SELECT COUNT(*) AS n, COUNT(*) FILTER (WHERE is_encrypted) AS e FROM old_rows) d
+    WHERE c.id = 1;
+  ELSIF TG_OP = 'UPDATE' THEN
+    UPDATE message_counters c
+    SET encrypted = c.encrypted + d.e
+    FROM (
+      SELECT (SELECT COUNT(*) FILTER (WHERE is_encrypted) FROM new_rows)
+           - (SELECT COUNT(*) FILTER (WHERE is_encrypted) FROM old_rows) AS e
+    ) d
+    WHERE c.id = 1 AND d.e <> 0;
+  ELSIF TG_OP = 'TRUNCATE' THEN
+    UPDATE message_counters SET total = 0, encrypted = 0 WHERE id = 1;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_message_counters_insert ON messages;
+CREATE TRIGGER trg_message_counters_insert
+  AFTER INSERT ON messages REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION message_counters_update();
+
+DROP TRIGGER IF EXISTS trg_message_counters_delete ON messages;
+CREATE TRIGGER trg_message_counters_delete
+  AFTER DELETE ON messages REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION message_counters_update();
+
+DROP TRIGGER IF EXISTS trg_message_counters_update ON messages;
+CREATE TRIGGER trg_message_counters_update
+  AFTER UPDATE ON messages REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION message_counters_update();
+
+DROP TRIGGER IF EXISTS trg_message_counters_truncate ON messages;
+CREATE TRIGGER trg_message_counters_truncate
+  AFTER TRUNCATE ON messages
+  FOR EACH STATEMENT EXECUTE FUNCTION message_counters_update();
+
+COMMIT;
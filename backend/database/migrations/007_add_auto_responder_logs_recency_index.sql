@@ -0,0 +1,5 @@
+-- CONCURRENTLY cannot run inside a transaction block: apply this file on its own, outside BEGIN/COMMIT
+-- Per-user trigger log listing: for each of a user's rules, read its newest log rows in order
+-- (supersedes idx_auto_responder_logs_rule, dropped in 009 once this index exists)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_auto_responder_logs_rule_triggered
+  ON auto_responder_logs(rule_id, triggered_at DESC, id);
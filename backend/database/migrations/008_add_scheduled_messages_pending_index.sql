@@ -0,0 +1,6 @@
+-- CONCURRENTLY cannot run inside a transaction block: apply this file on its own, outside BEGIN/COMMIT
+-- Pending scheduled messages of one conversation in send order (the per-conversation
+-- listing and the cancel-on-reply path); sent and cancelled rows stay out of the index
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_scheduled_messages_conversation_pending
+  ON scheduled_messages(conversation_id, scheduled_at)
+  WHERE is_sent = FALSE AND is_cancelled = FALSE;
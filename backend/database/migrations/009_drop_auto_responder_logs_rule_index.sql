@@ -0,0 +1,3 @@
+-- CONCURRENTLY cannot run inside a transaction block: apply this file on its own, outside BEGIN/COMMIT
+-- idx_auto_responder_logs_rule is a prefix of idx_auto_responder_logs_rule_triggered (007)
+DROP INDEX CONCURRENTLY IF EXISTS idx_auto_responder_logs_rule;
@@ -50,6 +50,7 @@ CREATE TABLE IF NOT EXISTS conversations (
 );
 CREATE UNIQUE INDEX IF NOT EXISTS uq_conversations_account_peer ON conversations(telegram_account_id, telegram_peer_id);
 CREATE INDEX IF NOT EXISTS idx_conversations_last_message_at ON conversations(last_message_at);
+CREATE INDEX IF NOT EXISTS idx_conversations_account_last_message ON conversations(telegram_account_id, last_message_at DESC NULLS LAST);
 
 -- Message type enum
 DO $$ BEGIN
@@ -80,8 +81,71 @@ CREATE TABLE IF NOT EXISTS messages (
 );
 CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages(conversation_id, id);
 CREATE INDEX IF NOT EXISTS idx_messages_created_at ON messages(created_at);
+CREATE INDEX IF NOT EXISTS idx_messages_conversation_created ON messages(conversation_id, created_at, id);
 CREATE INDEX IF NOT EXISTS idx_messages_encrypted ON messages(is_encrypted);
 
+-- Message counters maintained by triggers, so encryption stats don't scan messages
+CREATE TABLE IF NOT EXISTS message_counters (
+  id INTEGER PRIMARY KEY DEFAULT 1,
+  total BIGINT NOT NULL DEFAULT 0,
+  encrypted BIGINT NOT NULL DEFAULT 0,
+  CONSTRAINT single_row_check CHECK (id = 1)
+);
+
+-- Backfill from the current contents of messages
+INSERT INTO message_counters (id, total, encrypted)
+SELECT 1, COUNT(*), COUNT(*) FILTER (WHERE is_encrypted) FROM messages
+ON CONFLICT (id) DO NOTHING;
+
+-- Statement-level triggers with transition tables: one counter update per statement,
+-- so cascading deletes don't update the row once per message
+CREATE OR REPLACE FUNCTION message_counters_update() RETURNS trigger AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    UPDATE message_counters c
+    SET total = c.total + d.n, encrypted = c.encrypted + d.e
+    FROM (SELECT COUNT(*) AS n, COUNT(*) FILTER (WHERE is_encrypted) AS e FROM new_rows) d
+    WHERE c.id = 1;
+  ELSIF TG_OP = 'DELETE' THEN
+    UPDATE message_counters c
+    SET total = c.total - d.n, encrypted = c.encrypted - d.e
+    FROM (SELECT COUNT(*) AS n, COUNT(*) FILTER (WHERE is_encrypted) AS e FROM old_rows) d
+    WHERE c.id = 1;
+  ELSIF TG_OP = 'UPDATE' THEN
+    UPDATE message_counters c
+    SET encrypted = c.encrypted + d.e
+    FROM (
+      SELECT (SELECT COUNT(*) FILTER (WHERE is_encrypted) FROM new_rows)
+           - (SELECT COUNT(*) FILTER (WHERE is_encrypted) FROM old_rows) AS e
+    ) d
+    WHERE c.id = 1 AND d.e <> 0;
+  ELSIF TG_OP = 'TRUNCATE' THEN
+    UPDATE message_counters SET total = 0, encrypted = 0 WHERE id = 1;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_message_counters_insert ON messages;
+CREATE TRIGGER trg_message_counters_insert
+  AFTER INSERT ON messages REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION message_counters_update();
+
+DROP TRIGGER IF EXISTS trg_message_counters_delete ON messages;
+CREATE TRIGGER trg_message_counters_delete
+  AFTER DELETE ON messages REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION message_counters_update();
+
+DROP TRIGGER IF EXISTS trg_message_counters_update ON messages;
+CREATE TRIGGER trg_message_counters_update
+  AFTER UPDATE ON messages REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION message_counters_update();
+
+DROP TRIGGER IF EXISTS trg_message_counters_truncate ON messages;
+CREATE TRIGGER trg_message_counters_truncate
+  AFTER TRUNCATE ON messages
+  FOR EACH STATEMENT EXECUTE FUNCTION message_counters_update();
+
 -- Message Templates
 CREATE TABLE IF NOT EXISTS message_templates (
   id BIGSERIAL PRIMARY KEY,
@@ -108,6 +172,7 @@ CREATE TABLE IF NOT EXISTS scheduled_messages (
 CREATE INDEX IF NOT EXISTS idx_scheduled_messages_conversation ON scheduled_messages(conversation_id);
 CREATE INDEX IF NOT EXISTS idx_scheduled_messages_scheduled_at ON scheduled_messages(scheduled_at);
 CREATE INDEX IF NOT EXISTS idx_scheduled_messages_status ON scheduled_messages(is_sent, is_cancelled, scheduled_at);
+CREATE INDEX IF NOT EXISTS idx_scheduled_messages_conversation_pending ON scheduled_messages(conversation_id, scheduled_at) WHERE is_sent = FALSE AND is_cancelled = FALSE;
 
 -- Contact CRM Information
 CREATE TABLE IF NOT EXISTS contact_info (
@@ -162,7 +227,7 @@ CREATE TABLE IF NOT EXISTS auto_responder_logs (
   matched_keyword TEXT NOT NULL,
   triggered_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
-CREATE INDEX IF NOT EXISTS idx_auto_responder_logs_rule ON auto_responder_logs(rule_id);
+CREATE INDEX IF NOT EXISTS idx_auto_responder_logs_rule_triggered ON auto_responder_logs(rule_id, triggered_at DESC, id);
 CREATE INDEX IF NOT EXISTS idx_auto_responder_logs_conversation ON auto_responder_logs(conversation_id);
 CREATE INDEX IF NOT EXISTS idx_auto_responder_logs_triggered_at ON auto_responder_logs(triggered_at);
 
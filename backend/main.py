@@ -1,9 +1,12 @@
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from datetime import datetime
 import logging
 from app.core.config import settings
+from app.core.compression import APIGZipMiddleware
+from app.core.errors import UnhandledErrorMiddleware
 from app.core.encryption import initialize_encryption_service, encrypt_message_if_enabled
 from database import db
 from telethon_service import telethon_service
@@ -20,7 +23,8 @@ from app.features.contacts.routes import router as contacts_router
 from app.features.auto_responder.routes import router as auto_responder_router
 from app.features.admin.routes import router as admin_router
 from auth import get_current_user
-from jose import jwt, JWTError
+import jwt
+from jwt import PyJWTError
 from auto_responder_service import auto_responder_service
 
 logging.basicConfig(
@@ -208,9 +212,16 @@ app = FastAPI(
     title="Telegram Translator API",
     description="FastAPI backend for Telegram multi-account translator with Telethon",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
+# Unexpected errors become JSON 500s; added first so it sits inside CORS
+app.add_middleware(UnhandledErrorMiddleware)
+
+# Compress JSON bodies over 1 KiB (message lists, rules, logs)
+app.add_middleware(APIGZipMiddleware, minimum_size=1024, compresslevel=5)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[settings.frontend_url, "http://localhost:5173", "http://localhost:5174", "http://localhost:3000"],
@@ -274,7 +285,7 @@ async def websocket_endpoint(
             logger.info(f"WebSocket disconnected for user {user_id}")
             manager.disconnect(websocket, user_id)
 
-    except JWTError as e:
+    except PyJWTError as e:
         logger.error(f"WebSocket JWT error: {e}")
         # Can't close if never accepted, just log the error
         pass
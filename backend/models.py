@@ -92,6 +92,7 @@ class MessageResponse(BaseModel):
     edited_at: Optional[datetime]
     is_outgoing: bool = False
     media_file_name: Optional[str] = None
+    is_encrypted: bool = False  # Stored encrypted; the text fields are returned decrypted
 
 class MessageSend(BaseModel):
     conversation_id: int
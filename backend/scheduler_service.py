@@ -74,6 +74,17 @@ class SchedulerService:
         except Exception as e:
             logger.error(f"Failed to add scheduled message {message_id}: {e}")
     
+    async def reschedule(self, message_id: int, updated_row):
+        """Apply an updated scheduled_messages row (new text and/or time) in place"""
+        current = self.scheduled_messages.get(message_id)
+        if current is None:
+            # Not loaded yet; fetch it with its conversation details
+            await self.add_scheduled_message(message_id)
+            return
+        # Replace rather than mutate, the scheduler loop may hold the old dict
+        self.scheduled_messages[message_id] = {**current, **dict(updated_row)}
+        logger.info(f"Rescheduled message {message_id}")
+    
     async def remove_scheduled_message(self, message_id: int):
         """Remove a scheduled message from the scheduler"""
         if message_id in self.scheduled_messages:
@@ -83,12 +94,13 @@ class SchedulerService:
     async def cancel_scheduled_messages_for_conversation(self, conversation_id: int):
         """Cancel all scheduled messages for a conversation (when opposite party responds)"""
         try:
-            # Get scheduled messages before cancelling
+            # Cancel the pending messages and read them back in one statement
             scheduled_msgs = await db.fetch(
                 """
-                SELECT id, message_text, scheduled_at
-                FROM scheduled_messages
+                UPDATE scheduled_messages
+                SET is_cancelled = TRUE, cancelled_at = NOW()
                 WHERE conversation_id = $1 AND is_sent = FALSE AND is_cancelled = FALSE
+                RETURNING id, message_text, scheduled_at
                 """,
                 conversation_id
             )
@@ -96,43 +108,28 @@ class SchedulerService:
             if not scheduled_msgs:
                 return
             
-            # Update database
-            await db.execute(
-                """
-                UPDATE scheduled_messages
-                SET is_cancelled = TRUE, cancelled_at = NOW()
-                WHERE conversation_id = $1 AND is_sent = FALSE AND is_cancelled = FALSE
-                """,
-                conversation_id
-            )
-            
-            # Insert system message for each cancelled scheduled message and collect IDs
-            from datetime import datetime
-            system_messages = []
+            # Insert a system message for each cancelled scheduled message in a
+            # single round trip
+            system_texts = []
             for msg in scheduled_msgs:
                 scheduled_date = msg['scheduled_at'].strftime('%Y-%m-%d %H:%M')
-                system_text = f"Scheduled message cancelled (was scheduled for {scheduled_date}): \"{msg['message_text']}\""
-                
-                created_at = datetime.now()
-                msg_id = await db.fetchval(
-                    """
-                    INSERT INTO messages
-                    (conversation_id, sender_name, sender_username, type, original_text, created_at)
-                    VALUES ($1, $2, $3, $4, $5, $6)
-                    RETURNING id
-                    """,
-                    conversation_id,
-                    'System',
-                    'system',
-                    'system',
-                    system_text,
-                    created_at
+                system_texts.append(
+                    f"Scheduled message cancelled (was scheduled for {scheduled_date}): \"{msg['message_text']}\""
                 )
-                system_messages.append({
-                    'id': msg_id,
-                    'text': system_text,
-                    'created_at': created_at
-                })
+            
+            created_at = datetime.now()
+            system_messages = await db.fetch(
+                """
+                INSERT INTO messages
+                (conversation_id, sender_name, sender_username, type, original_text, created_at)
+                SELECT $1::bigint, 'System', 'system', 'system', system_text, $3::timestamptz
+                FROM unnest($2::text[]) AS system_text
+                RETURNING id, original_text
+                """,
+                conversation_id,
+                system_texts,
+                created_at
+            )
             
             # Remove from memory
             to_remove = [
@@ -182,11 +179,11 @@ class SchedulerService:
                                     "sender_name": "System",
                                     "sender_username": "system",
                                     "type": "system",
-                                    "original_text": sys_msg['text'],
+                                    "original_text": sys_msg['original_text'],
                                     "translated_text": None,
                                     "source_language": None,
                                     "target_language": None,
-                                    "created_at": sys_msg['created_at'].isoformat()
+                                    "created_at": created_at.isoformat()
                                 }
                             },
                             conversation['account_id'],
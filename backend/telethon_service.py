@@ -20,6 +20,9 @@ class TelegramSession:
         self.telegram_api_hash = telegram_api_hash
         self.is_connected = False
         self.session_filepath = session_filepath
+        # Account owner's Telegram user, fetched once on connect
+        self.me: Optional[User] = None
+        self.me_id: Optional[int] = None
         # Rate limiting: track last message time
         self.last_message_time = None
         self.min_message_interval = 1.0  # Minimum 1 second between messages
@@ -46,6 +49,13 @@ class TelegramSession:
                 self.is_connected = False
                 return False
 
+            try:
+                self.me = await self.client.get_me()
+                self.me_id = self.me.id
+            except Exception as e:
+                # Not fatal: _get_me() fetches it lazily on first send
+                logger.warning(f"Could not fetch account owner for session {self.account_id}: {e}")
+
             self.is_connected = True
             logger.info(f"Connected to Telegram Account. ID: {self.account_id}")
 
@@ -63,6 +73,13 @@ class TelegramSession:
             self.is_connected = False
             logger.info(f"Disconnected session: {self.account_id}")
 
+    async def _get_me(self) -> User:
+        """Return the account owner's user, fetching it only if connect didn't"""
+        if self.me is None:
+            self.me = await self.client.get_me()
+            self.me_id = self.me.id
+        return self.me
+
     async def get_dialogs(self, limit: int = 50):
         if not self.client or not self.is_connected:
             return []
@@ -253,7 +270,7 @@ class TelegramSession:
                 self.last_message_time = datetime.now()  # Update last message time
                 
                 # Get current user information
-                me = await self.client.get_me()
+                me = await self._get_me()
                 
                 return {
                     "message_id": message.id,
@@ -277,8 +294,21 @@ class TelegramSession:
                 logger.error(f"Error sending message for {self.account_id}: {e}")
                 raise
 
-    async def send_media(self, peer_id: int, file_path: str, caption: str = "", max_retries: int = 3):
-        """Send a media file (photo, video, document) to a peer"""
+    async def send_media(
+        self,
+        peer_id: int,
+        file,
+        caption: str = "",
+        max_retries: int = 3,
+        file_name: Optional[str] = None,
+        mime_type: Optional[str] = None,
+    ):
+        """Send a media file (photo, video, document) to a peer.
+
+        `file` is a path, or a seekable file-like object together with
+        `file_name`, whose extension decides how Telegram shows the media.
+        `mime_type` overrides the type Telethon would guess from the name.
+        """
         if not self.client or not self.is_connected:
             raise Exception("Client not connected")
 
@@ -290,18 +320,31 @@ class TelegramSession:
                 logger.debug(f"Rate limiting (media): waiting {wait_time:.2f}s before sending")
                 await asyncio.sleep(wait_time)
 
+        uploaded = None
         retry_count = 0
         while retry_count <= max_retries:
             try:
+                media = file
+                if file_name is not None:
+                    # Upload the stream once; retries reuse the uploaded handle
+                    if uploaded is None:
+                        # A previous attempt may have failed partway through
+                        # the stream; always upload from the first byte
+                        if hasattr(file, "seek"):
+                            file.seek(0)
+                        uploaded = await self.client.upload_file(file, file_name=file_name)
+                    media = uploaded
+                
                 message = await self.client.send_file(
                     peer_id,
-                    file_path,
-                    caption=caption
+                    media,
+                    caption=caption,
+                    mime_type=mime_type
                 )
                 self.last_message_time = datetime.now()  # Update last message time
                 
                 # Get current user information
-                me = await self.client.get_me()
+                me = await self._get_me()
                 
                 # Determine message type
                 msg_type = "document"
@@ -513,13 +556,23 @@ class TelethonService:
 
         return await session.search_users(username, limit)
 
-    async def send_media(self, account_id: int, peer_id: int, file_path: str, caption: str = ""):
-        """Send media file to a peer"""
+    async def send_media(
+        self,
+        account_id: int,
+        peer_id: int,
+        file,
+        caption: str = "",
+        file_name: Optional[str] = None,
+        mime_type: Optional[str] = None,
+    ):
+        """Send media file (a path, or a file-like object with file_name) to a peer"""
         session = self.sessions.get(account_id)
         if not session:
             raise Exception("Session not connected")
 
-        return await session.send_media(peer_id, file_path, caption)
+        return await session.send_media(
+            peer_id, file, caption, file_name=file_name, mime_type=mime_type
+        )
 
     async def download_media(self, account_id: int, telegram_message_id: int, peer_id: int, download_path: str):
         """Download media from a message"""
@@ -1,12 +1,29 @@
 from googletrans import Translator
-from typing import Optional
+from typing import Dict, Optional, Tuple
+from app.core.cache import TTLCache
+import asyncio
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Successful translations are reused for identical text and language pair
+TRANSLATION_CACHE_TTL = 7 * 24 * 60 * 60
+TRANSLATION_CACHE_MAXSIZE = 4096
+
 class TranslationService:
     def __init__(self):
         self.translator = Translator()
+        self._cache = TTLCache(ttl=TRANSLATION_CACHE_TTL, maxsize=TRANSLATION_CACHE_MAXSIZE)
+        # Upstream calls in progress by cache key; concurrent misses share one
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+
+    @staticmethod
+    def _cache_key(text: str, target_language: str, source_language: str) -> tuple:
+        # Surrounding whitespace doesn't change the translation, so "hi" and
+        # "hi\n" share an entry; case and inner spacing can change it, so they stay
+        digest = hashlib.blake2b(text.strip().encode(), digest_size=16).digest()
+        return (source_language, target_language, digest)
 
     async def translate_text(
         self,
@@ -14,17 +31,33 @@ class TranslationService:
         target_language: str,
         source_language: str = "auto"
     ) -> dict:
-        try:
-            result = self.translator.translate(
-                text,
-                dest=target_language,
-                src=source_language
+        cache_key = self._cache_key(text, target_language, source_language)
+        cached = self._cache.get(cache_key)
+        if cached is not None:
+            translated_text, detected_source = cached
+            return {
+                "original_text": text,
+                "translated_text": translated_text,
+                "source_language": detected_source,
+                "target_language": target_language
+            }
+
+        pending = self._inflight.get(cache_key)
+        if pending is None:
+            pending = asyncio.ensure_future(
+                self._translate_upstream(cache_key, text, target_language, source_language)
             )
+            self._inflight[cache_key] = pending
+            pending.add_done_callback(lambda _: self._inflight.pop(cache_key, None))
+
+        try:
+            # Shielded so one caller going away doesn't cancel the others' call
+            translated_text, detected_source = await asyncio.shield(pending)
 
             return {
                 "original_text": text,
-                "translated_text": result.text,
-                "source_language": result.src,
+                "translated_text": translated_text,
+                "source_language": detected_source,
                 "target_language": target_language
             }
 
@@ -38,6 +71,25 @@ class TranslationService:
                 "error": str(e)
             }
 
+    async def _translate_upstream(
+        self,
+        cache_key: tuple,
+        text: str,
+        target_language: str,
+        source_language: str
+    ) -> Tuple[str, str]:
+        # googletrans is blocking, so it runs off the event loop
+        result = await asyncio.to_thread(
+            self.translator.translate,
+            text,
+            dest=target_language,
+            src=source_language
+        )
+
+        # Only successes are cached; a failed call is retried next time
+        self._cache.set(cache_key, (result.text, result.src))
+        return result.text, result.src
+
     def detect_language(self, text: str) -> Optional[str]:
         try:
             detection = self.translator.detect(text)
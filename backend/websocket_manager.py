@@ -1,7 +1,7 @@
 from fastapi import WebSocket
 from typing import Dict, Set
 import logging
-import json
+import orjson
 
 logger = logging.getLogger(__name__)
 
@@ -30,10 +30,12 @@ class ConnectionManager:
     async def send_personal_message(self, message: dict, user_id: int):
         if user_id in self.active_connections:
             disconnected = set()
+            # Serialize once for all of the user's sockets; orjson also handles datetimes
+            text = orjson.dumps(message).decode()
 
             for connection in self.active_connections[user_id]:
                 try:
-                    await connection.send_json(message)
+                    await connection.send_text(text)
                 except Exception as e:
                     logger.error(f"Error sending message to user {user_id}: {e}")
                     disconnected.add(connection)